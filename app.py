@@ -1,10 +1,11 @@
+import os
 import streamlit as st 
-import pandas as pd
 import plotly.graph_objects as go
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import LabelEncoder
-from sklearn.metrics import accuracy_score, precision_score
 import streamlit.components.v1 as components
+from soil_model import FEATURES, get_model_bundle
+from recommendations import recommend_fertilizer
+from what_if import response_surface
+import metrics
 
 # --- Page Config ---
 st.set_page_config(page_title="Phoenix Fertility Engine", layout="centered")
@@ -54,7 +55,12 @@ translations = {
         "lbl_SM": "💧 Soil Moisture",
         "lbl_PMR": "⚔️ Pest Mortality Rate",
         "lbl_PHI": "🌟 Plant Health Index",
-        "lbl_remaining": "Remaining"
+        "lbl_remaining": "Remaining",
+        "whatif": "What-if Explorer",
+        "x_axis": "X axis",
+        "y_axis": "Y axis",
+        "tox_prob": "Toxicity probability",
+        "current": "Current values"
     },
     "தமிழ்": {
         "title": "பீனிக்ஸ் உரம் இயந்திரம்",
@@ -85,7 +91,12 @@ translations = {
         "lbl_SM": "💧 மண் ஈரம்",
         "lbl_PMR": "⚔️ பூச்சி இறப்பு விகிதம்",
         "lbl_PHI": "🌟 தாவர ஆரோக்கிய குறியீடு",
-        "lbl_remaining": "மீதமுள்ளவை"
+        "lbl_remaining": "மீதமுள்ளவை",
+        "whatif": "என்ன-ஆனால் ஆய்வு",
+        "x_axis": "X அச்சு",
+        "y_axis": "Y அச்சு",
+        "tox_prob": "நச்சுத்தன்மை நிகழ்தகவு",
+        "current": "தற்போதைய மதிப்புகள்"
     }
 }
 t = translations[language]
@@ -124,53 +135,28 @@ for label, page in nav_options:
 if "page" not in st.session_state:
     st.session_state.page = "home"
 
-# --- Load Data & Train Model ---
+# --- Metrics (optional /metrics endpoint on METRICS_PORT) ---
+if os.environ.get("METRICS_PORT"):
+    metrics.serve(int(os.environ["METRICS_PORT"]))
+
+# --- Load Model ---
 try:
-    data = pd.read_csv(r"fertilizer_ph_data.csv") 
-    le = LabelEncoder()
-    data['Toxicity'] = le.fit_transform(data['Toxicity'])
-    X = data.drop('Toxicity', axis=1)
-    y = data['Toxicity']
-    model = RandomForestClassifier(n_estimators=100, random_state=42)
-    model.fit(X, y)
-    y_pred = model.predict(X)
-    accuracy = round(accuracy_score(y, y_pred) * 100, 2)
-    precision = round(precision_score(y, y_pred, average='macro') * 100, 2)
-    default = X.iloc[0]
+    bundle = get_model_bundle()
 except FileNotFoundError:
     st.error("Error: 'fertilizer_ph_data.csv' not found. Please check the file path.")
     st.stop()
+engine = bundle["engine"]
+le = bundle["encoder"]
+accuracy = bundle["metrics"]["accuracy"]
+precision = bundle["metrics"]["precision"]
+default = bundle["defaults"]
 
 fertilizer_image = "https://www.gardendesign.com/pictures/images/900x705Max/site_3/applying-fertilizer-blue-trowel-fertilizing-tomato-plant-shutterstock-com_15275.jpg"
 
 # --- Helper Functions ---
-def recommend_fertilizer(pH, N, P, K, OM, SM, PMR, PHI):
-    recs = []
-    if language == "English":
-        if pH < 5.5: recs.append("🧪 Add lime to reduce acidity.")
-        elif pH > 7.5: recs.append("🧪 Add sulfur or compost to lower alkalinity.")
-        if N < 1.5: recs.append("🌬️ Use urea or ammonium sulfate.")
-        if P < 1.0: recs.append("🔥 Apply single super phosphate.")
-        if K < 1.5: recs.append("🪨 Use muriate of potash or composted banana peels.")
-        if OM < 3.0: recs.append("🌿 Add organic manure or vermicompost.")
-        if SM < 40: recs.append("💧 Improve irrigation or add mulch.")
-        if PMR < 75: recs.append("⚔️ Use neem-based biopesticides.")
-        if PHI < 80: recs.append("🌟 Apply balanced NPK and monitor stress.")
-    else:  # Tamil
-        if pH < 5.5: recs.append("🧪 அமிலத்தன்மையை குறைக்க சுண்ணாம்பு சேர்க்கவும்.")
-        elif pH > 7.5: recs.append("🧪 காரத்தன்மையை குறைக்க சல்பர் அல்லது கம்போஸ்ட் சேர்க்கவும்.")
-        if N < 1.5: recs.append("🌬️ யூரியா அல்லது அமோனியம் சல்பேட் பயன்படுத்தவும்.")
-        if P < 1.0: recs.append("🔥 சிங்கிள் சூப்பர் பாஸ்பேட் பயன்படுத்தவும்.")
-        if K < 1.5: recs.append("🪨 முரியேட் ஆஃப் பொட்டாஷ் அல்லது வாழைப்பழ தோல் கம்போஸ்ட் பயன்படுத்தவும்.")
-        if OM < 3.0: recs.append("🌿 இயற்கை உரம் அல்லது வெர்மி கம்போஸ்ட் சேர்க்கவும்.")
-        if SM < 40: recs.append("💧 நீர்ப்பாசனத்தை மேம்படுத்தவும் அல்லது மல்ச் பயன்படுத்தவும்.")
-        if PMR < 75: recs.append("⚔️ வேப்பை அடிப்படையிலான உயிர் பூச்சிக்கொல்லிகளை பயன்படுத்தவும்.")
-        if PHI < 80: recs.append("🌟 சமநிலை NPK உரம் பயன்படுத்தி செடி அழுத்தத்தை கண்காணிக்கவும்.")
-    return recs
-
 def show_prediction_block(values):
-    sample = [values]
-    prediction = model.predict(sample)
+    with metrics.timer("predict"):
+        prediction = engine.predict([values])
     result = le.inverse_transform(prediction)[0]
     average = round(sum(values) / len(values), 2)
     st.markdown(f"**📊 {t['average']}:** {average}")
@@ -182,11 +168,29 @@ def show_prediction_block(values):
         st.error(f"❌ {t['bad']}")
     st.markdown(f"**{t['model']}:** Random Forest Classifier")
     st.markdown(f"**{t['accuracy']}:** {accuracy}%  |  **{t['precision']}:** {precision}%")
-    recs = recommend_fertilizer(*values)
+    recs = recommend_fertilizer(*values, language=language)
     st.markdown(f"### 🌿 {t['recommend']}:")
     for r in recs:
         st.markdown(f"- {r}")
 
+FEATURE_LABEL_KEYS = ["lbl_pH", "lbl_N", "lbl_P", "lbl_K", "lbl_OM", "lbl_SM", "lbl_PMR", "lbl_PHI"]
+
+def show_what_if(values):
+    # Toxicity probability over two features with the others fixed; the
+    # surface is cached in what_if, so moving the two plotted sliders only
+    # moves the marker.
+    st.markdown(f"### 🗺️ {t['whatif']}")
+    labels = {f: t[k] for f, k in zip(FEATURES, FEATURE_LABEL_KEYS)}
+    col_x, col_y = st.columns(2)
+    x_feature = col_x.selectbox(t['x_axis'], FEATURES, format_func=labels.get, key="whatif_x")
+    y_feature = col_y.selectbox(t['y_axis'], [f for f in FEATURES if f != x_feature], format_func=labels.get, key="whatif_y")
+    with metrics.timer("what_if"):
+        xs, ys, z = response_surface(bundle, x_feature, y_feature, values)
+    fig = go.Figure(go.Heatmap(x=xs, y=ys, z=z, zmin=0, zmax=1, colorscale="RdYlGn_r", colorbar=dict(title=t['tox_prob'])))
+    fig.add_trace(go.Scatter(x=[values[FEATURES.index(x_feature)]], y=[values[FEATURES.index(y_feature)]], mode="markers", name=t['current'], marker=dict(size=14, symbol="x", color=accent)))
+    fig.update_layout(template="plotly_dark" if theme == "Dark" else "plotly_white", xaxis_title=labels[x_feature], yaxis_title=labels[y_feature], height=500, showlegend=False)
+    st.plotly_chart(fig, use_container_width=True)
+
 # --- Page Logic ---
 if st.session_state.page == "home":
     st.image("https://upload.wikimedia.org/wikipedia/commons/thumb/9/9b/Phoenix-Fantasy.svg/800px-Phoenix-Fantasy.svg.png", width=120)
@@ -222,8 +226,10 @@ elif st.session_state.page == "adjust":
     st.session_state.SM = st.slider(t['lbl_SM'], 0, 100, int(default["SoilMoisture"]))
     st.session_state.PMR = st.slider(t['lbl_PMR'], 0, 100, int(default["PestMortalityRate"]))
     st.session_state.PHI = st.slider(t['lbl_PHI'], 0, 100, int(default["PlantHealthIndex"]))
+    adjusted = [st.session_state.pH, st.session_state.N, st.session_state.P, st.session_state.K, st.session_state.OM, st.session_state.SM, st.session_state.PMR, st.session_state.PHI]
     if st.button(f"🔍 {t['predict']}"):
-        show_prediction_block([st.session_state.pH, st.session_state.N, st.session_state.P, st.session_state.K, st.session_state.OM, st.session_state.SM, st.session_state.PMR, st.session_state.PHI])
+        show_prediction_block(adjusted)
+    show_what_if(adjusted)
 
 elif st.session_state.page == "graph":
     st.header(f"📊 {t['graph']}")
@@ -233,6 +239,7 @@ elif st.session_state.page == "graph":
     fig = go.Figure(data=[go.Bar(x=x_labels, y=y_vals, marker_color=[accent] * 8)])
     fig.update_layout(template="plotly_dark" if theme == "Dark" else "plotly_white", yaxis=dict(range=[0, 100]), height=450)
     st.plotly_chart(fig, use_container_width=True)
+    show_what_if(y_vals)
 
 elif st.session_state.page == "manual":
     st.header(f"🧪 {t['manual']}")
@@ -0,0 +1,135 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from recommendations import format_recommendations, recommendation_bits
+from soil_model import FEATURES, get_model_bundle
+
+CHUNK_ROWS = 50_000
+INVALID = "missing or non-numeric feature"
+
+
+def _is_parquet(path):
+    return os.path.splitext(path)[1].lower() in (".parquet", ".pq")
+
+def _float_features(df):
+    # A column only comes out non-numeric if some cell is not a number; those
+    # cells become NaN here and are flagged by score_chunk, rather than
+    # failing the whole file.
+    for f in FEATURES:
+        col = df[f]
+        if not pd.api.types.is_numeric_dtype(col):
+            col = pd.to_numeric(col, errors="coerce")
+        df[f] = col.astype(float)
+    return df
+
+def iter_chunks(path, chunk_rows=CHUNK_ROWS):
+    # Every chunk must come out with the same dtypes, or the Parquet writer
+    # rejects it: features are always float, and the other CSV columns use
+    # nullable dtypes so a blank cell does not turn an int column into float.
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield _float_features(batch.to_pandas())
+    else:
+        for chunk in pd.read_csv(path, chunksize=chunk_rows, dtype_backend="numpy_nullable"):
+            yield _float_features(chunk)
+
+def score_chunk(chunk, bundle, language=None):
+    """Predictions and recommendations for ``chunk``.
+
+    Rows with a blank, non-numeric or infinite feature are not scored (the
+    forest would still give them a confident label, which /predict refuses
+    too): their result columns stay empty and ``error`` says why.
+    """
+    X = chunk[bundle["features"]]
+    valid = np.isfinite(X.to_numpy(float)).all(axis=1)
+    out = chunk.copy()
+    out["prediction"] = pd.Series(pd.NA, index=chunk.index, dtype="string")
+    out["probability"] = np.nan
+    if valid.any():
+        proba = bundle["model"].predict_proba(X if valid.all() else X[valid])
+        best = proba.argmax(axis=1)
+        out.loc[valid, "prediction"] = bundle["encoder"].inverse_transform(best)
+        out.loc[valid, "probability"] = proba[np.arange(len(best)), best].round(4)
+    bits = recommendation_bits(chunk)
+    out["recommendation_codes"] = pd.Series(format_recommendations(bits), index=chunk.index, dtype="string").where(valid)
+    if language:
+        out["recommendations"] = pd.Series(format_recommendations(bits, language, sep=" | "),
+                                           index=chunk.index, dtype="string").where(valid)
+    out["error"] = pd.Series(np.where(valid, None, INVALID), index=chunk.index, dtype="string")
+    return out
+
+
+class _Writer:
+    def __init__(self, path):
+        self.path = path
+        self.parquet = _is_parquet(path)
+        self._pq_writer = None
+        self._first = True
+
+    def write(self, df):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._pq_writer is None:
+                self._pq_writer = pq.ParquetWriter(self.path, table.schema)
+            elif not table.schema.equals(self._pq_writer.schema):
+                # e.g. a column that is all blank in this chunk only
+                table = table.cast(self._pq_writer.schema)
+            self._pq_writer.write_table(table)
+        else:
+            df.to_csv(self.path, mode="w" if self._first else "a", header=self._first, index=False)
+        self._first = False
+
+    def close(self):
+        if self._pq_writer is not None:
+            self._pq_writer.close()
+
+
+def score_file(in_path, out_path, chunk_rows=CHUNK_ROWS, language=None, bundle=None):
+    """Score a CSV/Parquet file of soil readings chunk by chunk.
+
+    Only one chunk is held in memory at a time, so memory stays bounded by
+    ``chunk_rows`` regardless of the input size. Returns row counts (with
+    the number of rows that could not be scored) and throughput stats.
+    """
+    bundle = bundle or get_model_bundle()
+    writer = _Writer(out_path)
+    rows = invalid = 0
+    start = time.perf_counter()
+    try:
+        for chunk in iter_chunks(in_path, chunk_rows):
+            out = score_chunk(chunk, bundle, language)
+            writer.write(out)
+            rows += len(chunk)
+            invalid += int(out["error"].notna().sum())
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - start
+    return {
+        "rows": rows,
+        "invalid": invalid,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch soil toxicity scoring for CSV/Parquet files.")
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--language", default=None, help="also write localized advice (English or தமிழ்)")
+    args = parser.parse_args()
+    stats = score_file(args.input, args.output, args.chunk_rows, args.language)
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
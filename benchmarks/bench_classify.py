@@ -0,0 +1,82 @@
+"""Per-frame colour classification: seven inRange passes vs the colour LUT.
+
+    python -m benchmarks.bench_classify [--repeat 200]
+
+Also checks on random and synthetic ROIs that both paths agree on the
+status and on the green mask used for contour detection.
+"""
+import argparse
+import json
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from detectors import COLOR_RANGES, GREEN_BIT, classify_ratios, color_codes, color_ratios
+
+SIZES = [400, 720, 1080]
+
+
+def legacy(hsv):
+    green_mask = cv2.inRange(hsv, *COLOR_RANGES[0][1:])
+    cv2.findContours(green_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    total = hsv.shape[0] * hsv.shape[1]
+    ratios = [cv2.countNonZero(cv2.inRange(hsv, lo, hi)) / total for _, lo, hi in COLOR_RANGES]
+    return classify_ratios(ratios), green_mask
+
+def single_pass(hsv):
+    codes = color_codes(hsv)
+    green_mask = cv2.bitwise_and(codes, GREEN_BIT)
+    cv2.findContours(green_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    return classify_ratios(color_ratios(codes, green_mask)), green_mask
+
+def sample_rois(size, n, seed=0, noise=True):
+    rng = np.random.default_rng(seed)
+    for i in range(n):
+        # Blobs of random colour on a random background, so every class shows
+        # up. Per-pixel noise exercises range edges for the parity check but
+        # floods findContours, so timings use clean blobs.
+        if noise:
+            bgr = rng.integers(0, 256, (size, size, 3), dtype=np.uint8)
+        else:
+            bgr = np.full((size, size, 3), rng.integers(0, 256, 3), dtype=np.uint8)
+        for _ in range(4):
+            colour = tuple(int(c) for c in rng.integers(0, 256, 3))
+            centre = tuple(int(c) for c in rng.integers(0, size, 2))
+            cv2.circle(bgr, centre, int(rng.integers(size // 8, size // 2)), colour, -1)
+        yield cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV)
+
+def timed(fn, hsv, repeat):
+    times = np.empty(repeat)
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn(hsv)
+        times[i] = time.perf_counter() - start
+    return round(np.median(times) * 1e3, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    mismatches = 0
+    for hsv in sample_rois(400, 300):
+        (s1, m1), (s2, m2) = legacy(hsv), single_pass(hsv)
+        mismatches += s1 != s2 or not np.array_equal(m1 > 0, m2 > 0)
+
+    report = {"mismatches": int(mismatches), "median_ms": {}}
+    for size in SIZES:
+        hsv = next(sample_rois(size, 1, seed=size, noise=False))
+        report["median_ms"][f"{size}x{size}"] = {
+            "legacy": timed(legacy, hsv, args.repeat),
+            "single_pass": timed(single_pass, hsv, args.repeat),
+        }
+    print(json.dumps(report, indent=2))
+    if mismatches:
+        sys.exit("single-pass classifier disagrees with inRange")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Frames/sec and latency of the leaf detector backends.
+
+    python -m benchmarks.bench_detectors [--backends hsv yolo yolo-onnx yolo-onnx-int8]
+                                         [--frames 200] [--threads 8]
+
+``--threads`` request threads call ``classify`` concurrently, which is what
+lets the YOLO micro-batcher fill its batches. YOLO backends need
+ultralytics/torch (and onnxruntime for the ONNX variants).
+"""
+import argparse
+import json
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.synthetic import leaf_frame
+from detectors import GREEN_BIT, HsvDetector, YoloDetector, color_codes
+
+
+def build(backend):
+    if backend == "hsv":
+        return HsvDetector()
+    if backend == "yolo":
+        return YoloDetector(export=None)
+    if backend.startswith("yolo-"):
+        return YoloDetector(export=backend[len("yolo-"):])
+    raise ValueError(backend)
+
+def roi_inputs():
+    frame = cv2.flip(leaf_frame(), 1)
+    y1 = (frame.shape[0] - 400) // 2
+    roi = np.ascontiguousarray(frame[y1:y1 + 400, 100:500])
+    codes = color_codes(cv2.cvtColor(roi, cv2.COLOR_BGR2HSV))
+    return roi, codes, cv2.bitwise_and(codes, GREEN_BIT)
+
+def run(detector, frames, threads):
+    roi, codes, green_mask = roi_inputs()
+    detector.classify(roi, codes, green_mask)  # warm-up / lazy init
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(n):
+        local = []
+        for _ in range(n):
+            start = time.perf_counter()
+            detector.classify(roi, codes, green_mask)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    per_thread = max(1, frames // threads)
+    start = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(per_thread,)) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return {
+        "fps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(np.percentile(latencies, 50) * 1e3, 2),
+        "p99_ms": round(np.percentile(latencies, 99) * 1e3, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", nargs="+", default=["hsv", "yolo", "yolo-onnx"])
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    report = {}
+    for backend in args.backends:
+        try:
+            report[backend] = run(build(backend), args.frames, args.threads)
+        except ImportError as e:
+            report[backend] = {"skipped": str(e)}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
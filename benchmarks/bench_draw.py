@@ -0,0 +1,113 @@
+"""Per-frame draw_ui time: full-frame blend vs the cached panel sprite.
+
+    python -m benchmarks.bench_draw [--repeat 200]
+
+Also compares both outputs for every status and size. They are identical
+when putText draws hard-edged text (OpenCV 4 default); OpenCV 5 always
+anti-aliases glyphs and overlapping strokes blend twice, so up to 2 levels
+per channel is accepted.
+"""
+import argparse
+import json
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from real_time_detection import DISEASE_DB, draw_ui
+
+SIZES = {"480p": (480, 640), "720p": (720, 1280), "1080p": (1080, 1920)}
+
+
+# draw_ui as it was before the panel cache, kept as the baseline.
+def legacy_draw_ui(frame, box, state, info, debug_text=""):
+    x1,y1,x2,y2 = box
+    h,w = frame.shape[:2]
+
+    overlay = frame.copy()
+    cv2.rectangle(overlay,(w-400,0),(w,h),(20,20,20),-1)
+    cv2.addWeighted(overlay,0.7,frame,0.3,0,frame)
+
+    color=(0,255,255)
+    if state=="LOCKED" and info:
+        color=info['color']
+    if state=="IDLE":
+        color=(0,0,255)
+
+    l=40
+    cv2.line(frame,(x1,y1),(x1+l,y1),color,3)
+    cv2.line(frame,(x1,y1),(x1,y1+l),color,3)
+    cv2.line(frame,(x2,y2),(x2-l,y2),color,3)
+    cv2.line(frame,(x2,y2),(x2,y2-l),color,3)
+
+    bx=w-370
+    cv2.putText(frame,"PLANT SCANNER",(bx,50),1,1.5,(200,200,200),2)
+
+    if state=="LOCKED" and info:
+        cv2.putText(frame,info['title'],(bx,120),1,1.2,color,2)
+        cv2.putText(frame,"ACTION:",(bx,180),1,1.1,(255,255,255),1)
+        y=220
+        for f in info['fert']:
+            cv2.putText(frame,"> "+f,(bx,y),1,1.0,(200,200,200),1)
+            y+=35
+        cv2.putText(frame,info['tip'],(bx,y+20),1,0.9,color,1)
+    else:
+        cv2.putText(frame,"PLACE A LEAF",(bx,120),1,1.5,(0,0,255),2)
+
+    return frame
+
+
+def cases():
+    yield "IDLE", None
+    yield "SCANNING", None
+    for info in DISEASE_DB.values():
+        yield "LOCKED", info
+
+def box_for(h):
+    y1 = (h - 400) // 2
+    return (100, y1, 500, y1 + 400)
+
+def frames(size, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, (*size, 3), dtype=np.uint8)
+
+def timed(fn, base, box, info, repeat):
+    times = np.empty(repeat)
+    for i in range(repeat):
+        frame = base.copy()
+        start = time.perf_counter()
+        fn(frame, box, "LOCKED", info)
+        times[i] = time.perf_counter() - start
+    return round(np.median(times) * 1e3, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    mismatches = max_diff = 0
+    for size in SIZES.values():
+        base = frames(size)
+        for state, info in cases():
+            a = legacy_draw_ui(base.copy(), box_for(size[0]), state, info)
+            b = draw_ui(base.copy(), box_for(size[0]), state, info)
+            diff = int(np.abs(a.astype(int) - b).max())
+            max_diff = max(max_diff, diff)
+            mismatches += diff > 2
+
+    info = DISEASE_DB["N_DEF"]
+    report = {"mismatches": int(mismatches), "max_abs_diff": max_diff, "median_ms": {}}
+    for name, size in SIZES.items():
+        base = frames(size, seed=1)
+        report["median_ms"][name] = {
+            "legacy": timed(legacy_draw_ui, base, box_for(size[0]), info, args.repeat),
+            "cached_panel": timed(draw_ui, base, box_for(size[0]), info, args.repeat),
+        }
+    print(json.dumps(report, indent=2))
+    if mismatches:
+        sys.exit("cached panel output differs from the full-frame blend")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Parity check and latency benchmark: sklearn forest vs CompiledForest.
+
+    python -m benchmarks.bench_forest [--rows 100000] [--repeat 2000] [--saved]
+
+Trains on synthetic soil rows unless --saved is given, in which case the
+app's model bundle is used. Exits non-zero if the compiled engine's
+probabilities differ from sklearn's.
+"""
+import argparse
+import json
+import sys
+import time
+import warnings
+
+import numpy as np
+
+from benchmarks.synthetic import synthetic_bundle
+from soil_model import FEATURE_RANGES, FEATURES, get_model_bundle
+
+
+def random_rows(n, seed=0):
+    rng = np.random.default_rng(seed)
+    lo = np.array([FEATURE_RANGES[f][0] for f in FEATURES], dtype=float)
+    hi = np.array([FEATURE_RANGES[f][1] for f in FEATURES], dtype=float)
+    return lo + rng.random((n, len(FEATURES))) * (hi - lo)
+
+def row_latency(fn, rows, repeat):
+    times = np.empty(repeat)
+    for i in range(repeat):
+        row = rows[i % len(rows)][None, :]
+        start = time.perf_counter()
+        fn(row)
+        times[i] = time.perf_counter() - start
+    return {
+        "p50_us": round(np.percentile(times, 50) * 1e6, 1),
+        "p99_us": round(np.percentile(times, 99) * 1e6, 1),
+    }
+
+def batch_throughput(fn, X):
+    start = time.perf_counter()
+    fn(X)
+    return round(len(X) / (time.perf_counter() - start), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--saved", action="store_true", help="use the app's model bundle")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+    bundle = get_model_bundle() if args.saved else synthetic_bundle()
+    model, engine = bundle["model"], bundle["engine"]
+    X = random_rows(args.rows)
+
+    # Plain arrays on both sides; sklearn's feature-name check is not what we measure.
+    sk_proba = lambda a: model.predict_proba(np.asarray(a, dtype=np.float32))
+    mismatch = np.abs(sk_proba(X) - engine.predict_proba(X)).max()
+
+    report = {
+        "parity_max_abs_diff": float(mismatch),
+        "sklearn": {**row_latency(sk_proba, X, args.repeat), "batch_rows_per_sec": batch_throughput(sk_proba, X)},
+        "compiled": {**row_latency(engine.predict_proba, X, args.repeat), "batch_rows_per_sec": batch_throughput(engine.predict_proba, X)},
+    }
+    print(json.dumps(report, indent=2))
+    if mismatch > 1e-9:
+        sys.exit("compiled forest disagrees with sklearn")
+
+
+if __name__ == "__main__":
+    main()
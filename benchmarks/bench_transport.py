@@ -0,0 +1,53 @@
+"""Frames/sec and bytes per frame for the /process_frame transports.
+
+    python -m benchmarks.bench_transport [--frames 200]
+"""
+import argparse
+import base64
+import json
+import time
+
+from benchmarks.synthetic import encode_jpeg, leaf_frame
+from real_time_detection import app
+
+
+def run(client, frames, request_fn):
+    sent = received = 0
+    start = time.perf_counter()
+    for _ in range(frames):
+        body, resp = request_fn(client)
+        sent += body
+        received += len(resp.data)
+    elapsed = time.perf_counter() - start
+    return {
+        "fps": round(frames / elapsed, 1),
+        "request_bytes_per_frame": sent // frames,
+        "response_bytes_per_frame": received // frames,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=200)
+    args = parser.parse_args()
+
+    jpeg = encode_jpeg(leaf_frame())
+    data_url = json.dumps({"image": "data:image/jpeg;base64," + base64.b64encode(jpeg).decode()})
+
+    def legacy(c):
+        return len(data_url), c.post("/process_frame", data=data_url, content_type="application/json")
+
+    def raw_jpeg(c):
+        return len(jpeg), c.post("/process_frame_raw", data=jpeg, content_type="image/jpeg")
+
+    def raw_json(c):
+        return len(jpeg), c.post("/process_frame_raw?output=json", data=jpeg, content_type="image/jpeg")
+
+    client = app.test_client()
+    report = {name: run(client, args.frames, fn)
+              for name, fn in (("legacy_base64", legacy), ("raw_jpeg", raw_jpeg), ("raw_json", raw_json))}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
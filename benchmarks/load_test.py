@@ -0,0 +1,121 @@
+"""Throughput of the gunicorn deployment with 1..N worker processes.
+
+    python -m benchmarks.load_test [--max-workers 4] [--clients 8] [--seconds 10]
+
+For each worker count a fresh server is started with gunicorn.conf.py,
+warmed up, and driven by ``--clients`` client processes that POST JPEG
+frames to /process_frame_raw over keep-alive connections, one scanner
+session per client. Prints requests/s, latency and the speed-up over one
+worker as JSON. /process_frame_raw is stateless apart from the voting
+state (kept in SQLite with several workers), and it is what the Live page
+uses whenever the server runs more than one worker (see gunicorn.conf.py).
+
+The clients run on the same machine and take CPU from the server; for
+clean numbers give them spare cores (or run with fewer clients) and keep
+--max-workers at or below the cores left for the server.
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import disease_frame, encode_jpeg
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(workers, port):
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), PORT=str(port))
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "-b", f"127.0.0.1:{port}",
+         "real_time_detection:create_app()"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with {proc.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/scanner_stats")
+            if conn.getresponse().status == 200:
+                return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("gunicorn did not come up")
+
+def client(args):
+    port, cid, body, seconds = args
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    path = f"/process_frame_raw?session=load-{cid}&adaptive=0"
+    headers = {"Content-Type": "image/jpeg"}
+    latencies, errors = [], 0
+    end = time.perf_counter() + seconds
+    while (start := time.perf_counter()) < end:
+        try:
+            conn.request("POST", path, body, headers)
+            resp = conn.getresponse()
+            resp.read()
+            if resp.status == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+        except OSError:
+            errors += 1
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    return latencies, errors
+
+def run(workers, clients, seconds, body):
+    port = free_port()
+    server = start_server(workers, port)
+    try:
+        with multiprocessing.get_context("spawn").Pool(clients) as pool:
+            # Short warm-up so every worker has imported/allocated its buffers.
+            pool.map(client, [(port, i, body, 1) for i in range(clients)])
+            results = pool.map(client, [(port, i, body, seconds) for i in range(clients)])
+    finally:
+        server.terminate()
+        server.wait(30)
+    latencies = np.concatenate([np.array(r[0]) for r in results]) if results else np.array([])
+    return {
+        "workers": workers,
+        "requests_per_sec": round(len(latencies) / seconds, 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1e3, 2) if len(latencies) else None,
+        "p99_ms": round(float(np.percentile(latencies, 99)) * 1e3, 2) if len(latencies) else None,
+        "errors": sum(r[1] for r in results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    parser.add_argument("--clients", type=int, help="default: 2 x max workers")
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+    clients = args.clients or 2 * args.max_workers
+
+    body = encode_jpeg(disease_frame("K_DEF"))
+    rows = []
+    for workers in range(1, args.max_workers + 1):
+        row = run(workers, clients, args.seconds, body)
+        base = rows[0]["requests_per_sec"] if rows else row["requests_per_sec"]
+        row["speedup"] = round(row["requests_per_sec"] / base, 2) if base else None
+        rows.append(row)
+        print(json.dumps(row), file=sys.stderr)
+    print(json.dumps({"cores": os.cpu_count(), "clients": clients, "seconds": args.seconds, "runs": rows}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
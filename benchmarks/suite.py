@@ -0,0 +1,188 @@
+"""End-to-end benchmark suite with baseline comparison.
+
+    python -m benchmarks.suite [--out results.json] [--baseline baseline.json]
+                               [--threshold 0.2] [--threshold model_fit=0.5]
+                               [--only classify_leaf,draw_ui]
+
+Everything runs on synthetic data (benchmarks.synthetic), so no CSV, saved
+model or camera is needed and two runs on the same machine measure the same
+work. Each result records its unit and whether lower or higher is better.
+With --baseline, a result that is worse than the baseline by more than its
+threshold (a fraction, 0.2 = 20%) is reported as a regression and the exit
+status is 1. Baselines are machine specific: save one with --out on the
+box you deploy to, then compare later runs against it.
+
+The suite also exits non-zero if a synthetic leaf is classified as the
+wrong class, so a "speed-up" that changes results does not pass.
+"""
+import argparse
+import base64
+import json
+import os
+import platform
+import sys
+import time
+import warnings
+
+import cv2
+import numpy as np
+import sklearn
+
+from benchmarks.synthetic import (DISEASE_BANDS, HSV_UNREACHABLE, disease_frame,
+                                  disease_roi, encode_jpeg, soil_rows, synthetic_bundle)
+
+DEFAULT_THRESHOLD = 0.2
+
+
+def latency(fn, inputs, repeat, scale=1e3):
+    times = np.empty(repeat)
+    for i in range(repeat):
+        arg = inputs[i % len(inputs)]
+        start = time.perf_counter()
+        fn(arg)
+        times[i] = time.perf_counter() - start
+    return np.percentile(times, 50) * scale, np.percentile(times, 99) * scale
+
+def result(value, unit, better="lower"):
+    return {"value": round(float(value), 4), "unit": unit, "better": better}
+
+# ---------------- CASES ----------------
+
+def bench_classify_leaf(args):
+    from detectors import classify_leaf
+
+    hsv = {s: cv2.cvtColor(disease_roi(s), cv2.COLOR_BGR2HSV) for s in DISEASE_BANDS}
+    wrong = {s: got for s in DISEASE_BANDS
+             if s not in HSV_UNREACHABLE and (got := classify_leaf(hsv[s])) != s}
+    p50, p99 = latency(classify_leaf, list(hsv.values()), args.repeat, 1e6)
+    return {"classify_leaf_p50": result(p50, "us"), "classify_leaf_p99": result(p99, "us")}, wrong
+
+def bench_process_frame(args):
+    from real_time_detection import app
+
+    client = app.test_client()
+    bodies = [{"image": "data:image/jpeg;base64," + base64.b64encode(encode_jpeg(disease_frame(s))).decode()}
+              for s in DISEASE_BANDS]
+    post = lambda body: client.post("/process_frame?adaptive=0&session=bench", json=body)
+    wrong = {}
+    if post(bodies[0]).status_code != 200:
+        wrong["process_frame"] = "non-200 response"
+    p50, p99 = latency(post, bodies, args.repeat // 4 or 1)
+    return {"process_frame_p50": result(p50, "ms"), "process_frame_p99": result(p99, "ms")}, wrong
+
+def bench_draw_ui(args):
+    from real_time_detection import DISEASE_DB, draw_ui
+
+    base = cv2.flip(disease_frame("HEALTHY"), 1)
+    box = (100, 40, 500, 440)
+    calls = [("LOCKED", info) for info in DISEASE_DB.values()] + [("IDLE", None), ("SCANNING", None)]
+    p50, p99 = latency(lambda c: draw_ui(base.copy(), box, *c), calls, args.repeat, 1e6)
+    return {"draw_ui_p50": result(p50, "us"), "draw_ui_p99": result(p99, "us")}, {}
+
+def _train(args):
+    start = time.perf_counter()
+    bundle = synthetic_bundle(args.fit_rows)
+    return bundle, time.perf_counter() - start
+
+def bench_model(args):
+    from soil_model import FEATURES
+
+    bundle, seconds = _train(args)
+    engine = bundle["engine"]
+    X = soil_rows(args.batch_rows, seed=1)[FEATURES].to_numpy(float)
+    rows = [X[i:i + 1] for i in range(min(len(X), 1000))]
+    p50, p99 = latency(engine.predict_proba, rows, args.repeat, 1e6)
+    start = time.perf_counter()
+    engine.predict_proba(X)
+    rate = len(X) / (time.perf_counter() - start)
+    return {
+        "model_fit": result(seconds, "s"),
+        "predict_single_p50": result(p50, "us"),
+        "predict_single_p99": result(p99, "us"),
+        "predict_batch": result(rate, "rows/s", "higher"),
+    }, {}
+
+CASES = {
+    "classify_leaf": bench_classify_leaf,
+    "process_frame": bench_process_frame,
+    "draw_ui": bench_draw_ui,
+    "model": bench_model,
+}
+
+# ---------------- BASELINE ----------------
+
+def compare(results, baseline, thresholds):
+    report = {}
+    for name, cur in results.items():
+        old = baseline.get(name)
+        if old is None or not old["value"]:
+            continue
+        limit = thresholds.get(name, thresholds[None])
+        change = cur["value"] / old["value"] - 1
+        worse = change > limit if cur["better"] == "lower" else change < -limit
+        report[name] = {"baseline": old["value"], "change": round(change, 4),
+                        "threshold": limit, "regression": worse}
+    return report
+
+def parse_thresholds(values):
+    thresholds = {None: DEFAULT_THRESHOLD}
+    for v in values:
+        name, _, limit = v.rpartition("=")
+        thresholds[name or None] = float(limit)
+    return thresholds
+
+def environment():
+    return {
+        "python": platform.python_version(), "platform": platform.platform(),
+        "cpus": os.cpu_count(), "numpy": np.__version__, "opencv": cv2.__version__,
+        "sklearn": sklearn.__version__, "timestamp": time.time(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--out")
+    parser.add_argument("--baseline")
+    parser.add_argument("--threshold", action="append", default=[],
+                        help="fraction, or NAME=fraction for one result")
+    parser.add_argument("--only", help="comma-separated cases: " + ",".join(CASES))
+    parser.add_argument("--repeat", type=int, default=400)
+    parser.add_argument("--fit-rows", type=int, default=5000)
+    parser.add_argument("--batch-rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+    selected = args.only.split(",") if args.only else list(CASES)
+    unknown = set(selected) - set(CASES)
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(sorted(unknown))}")
+
+    results, wrong = {}, {}
+    for name in selected:
+        res, bad = CASES[name](args)
+        results.update(res)
+        wrong.update(bad)
+
+    report = {"environment": environment(), "results": results}
+    if wrong:
+        report["wrong_results"] = wrong
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["comparison"] = compare(results, json.load(f)["results"], parse_thresholds(args.threshold))
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+
+    regressions = [n for n, c in report.get("comparison", {}).items() if c["regression"]]
+    if wrong or regressions:
+        sys.exit("; ".join(filter(None, [
+            wrong and f"wrong results: {wrong}",
+            regressions and f"regressions: {', '.join(regressions)}",
+        ])))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import os
+import tempfile
+
+import cv2
+import numpy as np
+
+FRAME_SIZE = (480, 640)
+
+
+def leaf_frame(bgr=(40, 160, 40), size=FRAME_SIZE, seed=0):
+    """A camera-like frame with a solid leaf where the scanner ROI lands.
+
+    The server mirrors frames before cropping its 400px box at x=100, so
+    the leaf is drawn at the mirrored position.
+    """
+    h, w = size
+    rng = np.random.default_rng(seed)
+    frame = rng.integers(90, 140, (h, w, 3), dtype=np.uint8)
+    cx, cy = w - 300, h // 2
+    cv2.ellipse(frame, (cx, cy), (150, 110), 30, 0, 360, bgr, -1)
+    return frame
+
+def encode_jpeg(frame, quality=90):
+    _, buf = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buf.tobytes()
+
+# ---------------- DISEASE FRAMES ----------------
+
+# HSV (OpenCV scale) of each colour class the heuristic looks for.
+HSV_COLORS = {
+    "green": (60, 180, 160), "yellow": (20, 200, 200), "brown": (10, 200, 120),
+    "white": (0, 10, 230), "dark": (0, 0, 30), "purple": (140, 180, 160),
+}
+
+# Bands painted into the scanner ROI, as (colour, fraction of ROI rows).
+# Every class keeps a solid green band so the contour gate lets it through.
+DISEASE_BANDS = {
+    "HEALTHY": [("green", .70)],
+    "N_DEF":   [("green", .10), ("yellow", .50)],
+    "FE_DEF":  [("green", .35), ("yellow", .28)],
+    "K_DEF":   [("green", .30), ("brown", .30)],
+    "P_DEF":   [("green", .30), ("purple", .20)],
+    "MG_DEF":  [("green", .30)],
+    "ZN_DEF":  [("green", .30), ("white", .30)],
+    "FUNGAL":  [("green", .30), ("dark", .25)],
+    "VIRAL":   [("green", .30)],
+    "PEST":    [("green", .60)],
+    "BACTERIAL": [("green", .60)],
+}
+# Only the YOLO model tells these apart; the colour heuristic cannot.
+HSV_UNREACHABLE = {"VIRAL", "PEST", "BACTERIAL"}
+
+ROI_SIZE = 400
+
+
+def _paint(rows, name, rng):
+    h, s, v = HSV_COLORS[name]
+    hsv = np.empty(rows.shape, np.uint8)
+    hsv[..., 0], hsv[..., 1] = h, s
+    hsv[..., 2] = np.clip(v + rng.integers(-8, 9, rows.shape[:2]), 0, 255)
+    rows[:] = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
+
+def disease_roi(status, seed=0):
+    """A 400x400 BGR scanner crop that looks like ``status`` to the HSV heuristic.
+
+    VIRAL adds a green/yellow mosaic, PEST fine dark specks and BACTERIAL
+    larger dark spots; none maps to its own class without the YOLO backend.
+    """
+    rng = np.random.default_rng(seed)
+    grey = rng.integers(90, 140, (ROI_SIZE, ROI_SIZE), dtype=np.uint8)
+    roi = cv2.merge([grey, grey, grey])
+    y = 0
+    for name, frac in DISEASE_BANDS[status]:
+        n = round(frac * ROI_SIZE)
+        _paint(roi[y:y + n], name, rng)
+        y += n
+    if status == "VIRAL":
+        band = roi[y:y + 120]
+        _paint(band, "green", rng)
+        tile = 20
+        for ty in range(0, band.shape[0], tile):
+            for tx in range((ty // tile) % 2 * tile, ROI_SIZE, 2 * tile):
+                _paint(band[ty:ty + tile, tx:tx + tile], "yellow", rng)
+    if status in ("PEST", "BACTERIAL"):
+        # Mites: many fine specks; bacterial spot: fewer, larger lesions.
+        count, radius = (150, 3) if status == "PEST" else (40, 7)
+        for cx, cy in rng.integers(5, (ROI_SIZE - 5, y - 5), (count, 2)):
+            cv2.circle(roi, (int(cx), int(cy)), radius, (20, 20, 20), -1)
+    return roi
+
+def disease_frame(status, size=FRAME_SIZE, seed=0):
+    """A camera frame (before the server's mirror flip) with ``disease_roi`` in the ROI."""
+    h, w = size
+    rng = np.random.default_rng(seed)
+    grey = rng.integers(90, 140, (h, w), dtype=np.uint8)
+    frame = cv2.merge([grey, grey, grey])
+    y1 = (h - ROI_SIZE) // 2
+    frame[y1:y1 + ROI_SIZE, w - 100 - ROI_SIZE:w - 100] = cv2.flip(disease_roi(status, seed), 1)
+    return frame
+
+# ---------------- SOIL ROWS ----------------
+
+def soil_rows(n, seed=0):
+    """``n`` rows shaped like fertilizer_ph_data.csv, labelled by a noisy rule."""
+    import pandas as pd
+    from soil_model import FEATURE_RANGES, FEATURES, TARGET
+
+    rng = np.random.default_rng(seed)
+    data = {}
+    for f in FEATURES:
+        lo, hi = FEATURE_RANGES[f]
+        col = lo + rng.random(n) * (hi - lo)
+        data[f] = col.round().astype(int) if isinstance(lo, int) else col.round(2)
+    df = pd.DataFrame(data)
+    # Roughly two thirds toxic, like the real file.
+    risk = (np.abs(df["pH"] - 6.5) / 1.5 + df["PestMortalityRate"] / 60
+            - df["PlantHealthIndex"] / 80 + rng.normal(0, .3, n))
+    df[TARGET] = np.where(risk > .75, "Toxic", "Safe")
+    return df
+
+def synthetic_bundle(n=5000, seed=0):
+    """A model bundle trained on ``soil_rows`` in a scratch directory, so it
+    needs neither the real CSV nor a saved bundle."""
+    from soil_model import train_bundle
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "soil.csv")
+        soil_rows(n, seed).to_csv(path, index=False)
+        return train_bundle(path, samples_dir=tmp)
@@ -0,0 +1,228 @@
+import copy
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+SESSION_TTL = float(os.environ.get("SESSION_TTL", 300))
+SWEEP_INTERVAL = 30
+WAIT_POLL = 0.5
+
+
+class DetectionSession:
+    """Voting state for one camera / scanner.
+
+    ``version`` goes up each time the reported ``status`` changes, so
+    viewers can tell whether anything new happened without comparing
+    payloads.
+    """
+
+    def __init__(self, vote_frames=7):
+        self.state = "IDLE"
+        self.status = None
+        self.version = 0
+        self.last_leaf_time = 0
+        self.history = deque(maxlen=vote_frames)
+        self.last_seen = time.time()
+
+    def etag(self):
+        return f"{self.version}-{self.status}"
+
+    def reset(self):
+        self.state = "IDLE"
+        self.status = None
+        self.history.clear()
+
+# ---------------- BACKENDS ----------------
+
+class InMemorySessionStore:
+    """Sessions kept in this process, one lock per session."""
+
+    def __init__(self, factory=DetectionSession, ttl=SESSION_TTL):
+        self.factory = factory
+        self.ttl = ttl
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition()
+        self._last_sweep = time.time()
+
+    def _entry(self, sid):
+        with self._lock:
+            now = time.time()
+            if now - self._last_sweep > SWEEP_INTERVAL:
+                self._evict(now)
+            entry = self._sessions.get(sid)
+            if entry is None:
+                entry = self._sessions[sid] = (self.factory(), threading.Lock())
+            return entry
+
+    def _evict(self, now):
+        self._last_sweep = now
+        for sid in [s for s, (sess, _) in self._sessions.items() if now - sess.last_seen > self.ttl]:
+            del self._sessions[sid]
+
+    @contextmanager
+    def session(self, sid):
+        sess, lock = self._entry(sid)
+        with lock:
+            sess.last_seen = time.time()
+            version = sess.version
+            yield sess
+            changed = sess.version != version
+        if changed:
+            with self._changed:
+                self._changed.notify_all()
+
+    def wait(self, sid, version, timeout):
+        """Return ``sid``'s session once its version differs from ``version``,
+        or as it is after ``timeout`` seconds."""
+        with self._changed:
+            self._changed.wait_for(lambda: self.get(sid).version != version, timeout)
+        return self.get(sid)
+
+    def get(self, sid):
+        with self._lock:
+            entry = self._sessions.get(sid)
+        if entry is None:
+            return self.factory()
+        sess, lock = entry
+        with lock:
+            return copy.copy(sess)
+
+    def count(self):
+        with self._lock:
+            return len(self._sessions)
+
+
+class SqliteSessionStore:
+    """Sessions pickled into a local SQLite file shared by all workers.
+
+    Each read-modify-write runs inside ``BEGIN IMMEDIATE``, which takes the
+    database write lock, so concurrent workers updating the same camera are
+    serialized instead of overwriting each other.
+
+    Viewers waiting for a change share one poller thread per worker, which
+    re-reads the watched sessions only when another connection has
+    committed and wakes the waiters through a Condition.
+    """
+
+    def __init__(self, path, factory=DetectionSession, ttl=SESSION_TTL):
+        self.path = path
+        self.factory = factory
+        self.ttl = ttl
+        self._local = threading.local()
+        self._last_sweep = 0
+        self._changed = threading.Condition()
+        self._watched = {}
+        self._versions = {}
+        self._poller_pid = None
+        with self._conn() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS sessions (sid TEXT PRIMARY KEY, data BLOB, last_seen REAL)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        return conn
+
+    @contextmanager
+    def session(self, sid):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if now - self._last_sweep > SWEEP_INTERVAL:
+                self._last_sweep = now
+                conn.execute("DELETE FROM sessions WHERE last_seen < ?", (now - self.ttl,))
+            row = conn.execute("SELECT data FROM sessions WHERE sid = ?", (sid,)).fetchone()
+            sess = pickle.loads(row[0]) if row else self.factory()
+            sess.last_seen = now
+            yield sess
+            conn.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)",
+                         (sid, pickle.dumps(sess, pickle.HIGHEST_PROTOCOL), now))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        # Waiters in this worker need not wait for the next poll.
+        with self._changed:
+            if sid in self._watched and self._versions.get(sid) != sess.version:
+                self._versions[sid] = sess.version
+                self._changed.notify_all()
+
+    def get(self, sid):
+        row = self._conn().execute("SELECT data FROM sessions WHERE sid = ?", (sid,)).fetchone()
+        return pickle.loads(row[0]) if row else self.factory()
+
+    def wait(self, sid, version, timeout):
+        """Return ``sid``'s session once its version differs from ``version``,
+        or as it is after ``timeout`` seconds."""
+        self._ensure_poller()
+        with self._changed:
+            self._watched[sid] = self._watched.get(sid, 0) + 1
+        try:
+            # Registered first, so a change after this read is seen by the poller.
+            sess = self.get(sid)
+            if sess.version != version:
+                return sess
+            with self._changed:
+                self._versions.setdefault(sid, version)
+                self._changed.wait_for(lambda: self._versions.get(sid, version) != version, timeout)
+        finally:
+            with self._changed:
+                self._watched[sid] -= 1
+                if not self._watched[sid]:
+                    del self._watched[sid]
+                    self._versions.pop(sid, None)
+        return self.get(sid)
+
+    def _ensure_poller(self):
+        with self._changed:
+            if self._poller_pid != os.getpid():
+                self._poller_pid = os.getpid()
+                threading.Thread(target=self._poll, name="session-poller", daemon=True).start()
+
+    def _poll(self):
+        # Writers may be other processes, so there is nothing to notify on.
+        # data_version only moves when another connection commits, so an
+        # idle database costs one PRAGMA per WAIT_POLL.
+        conn = self._conn()
+        seen = None
+        while True:
+            time.sleep(WAIT_POLL)
+            with self._changed:
+                sids = list(self._watched)
+            if not sids:
+                continue
+            data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version == seen:
+                continue
+            seen = data_version
+            rows = conn.execute(f"SELECT sid, data FROM sessions WHERE sid IN ({','.join('?' * len(sids))})",
+                                sids).fetchall()
+            versions = {sid: pickle.loads(data).version for sid, data in rows}
+            with self._changed:
+                changed = False
+                for sid in self._watched:
+                    version = versions.get(sid, 0)
+                    if self._versions.get(sid) != version:
+                        self._versions[sid] = version
+                        changed = True
+                if changed:
+                    self._changed.notify_all()
+
+    def count(self):
+        return self._conn().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+def make_store(factory=DetectionSession):
+    backend = os.environ.get("SESSION_BACKEND", "memory")
+    if backend == "sqlite":
+        return SqliteSessionStore(os.environ.get("SESSION_DB", "sessions.db"), factory)
+    if backend == "memory":
+        return InMemorySessionStore(factory)
+    raise ValueError(f"unknown SESSION_BACKEND: {backend}")
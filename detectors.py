@@ -0,0 +1,226 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import cv2
+import numpy as np
+
+DETECTOR_BACKEND = os.environ.get("DETECTOR_BACKEND", "hsv")
+YOLO_WEIGHTS = os.environ.get("YOLO_WEIGHTS", "best.pt")
+YOLO_EXPORT = os.environ.get("YOLO_EXPORT") or None
+YOLO_CONF = float(os.environ.get("YOLO_CONF", 0.5))
+BATCH_WINDOW = float(os.environ.get("YOLO_BATCH_WINDOW_MS", 10)) / 1000
+MAX_BATCH = int(os.environ.get("YOLO_MAX_BATCH", 8))
+
+# ---------------- HSV HEURISTIC ----------------
+
+# Inclusive HSV boxes, one bit per colour class. Every box is a product of
+# per-channel intervals, so a pixel's class bits are the AND of three
+# 256-entry lookups -- one LUT per channel instead of an inRange per class.
+COLOR_RANGES = [
+    ("green",  (25,40,40),  (90,255,255)),
+    ("yellow", (15,50,50),  (35,255,255)),
+    ("brown",  (5,50,20),   (15,255,200)),
+    ("white",  (0,0,200),   (180,40,255)),
+    ("dark",   (0,0,0),     (180,255,50)),
+    ("purple", (125,50,50), (160,255,255)),
+]
+GREEN_BIT = 1
+
+def _build_color_luts():
+    luts = np.zeros((3,256), np.uint8)
+    for bit, (_, lo, hi) in enumerate(COLOR_RANGES):
+        for c in range(3):
+            luts[c, lo[c]:hi[c]+1] |= 1 << bit
+    return luts
+
+COLOR_LUTS = _build_color_luts()
+
+def color_codes(hsv):
+    h,s,v = cv2.split(hsv)
+    codes = cv2.LUT(h, COLOR_LUTS[0])
+    cv2.bitwise_and(codes, cv2.LUT(s, COLOR_LUTS[1]), dst=codes)
+    cv2.bitwise_and(codes, cv2.LUT(v, COLOR_LUTS[2]), dst=codes)
+    return codes
+
+def color_ratios(codes, green_mask=None):
+    # Counting set pixels per bit plane of the single-channel code image is
+    # cheaper than a 64-bin calcHist, and the green plane is usually already
+    # computed for contour detection.
+    if green_mask is None:
+        green_mask = cv2.bitwise_and(codes, GREEN_BIT)
+    total = codes.size
+    counts = [cv2.countNonZero(green_mask)]
+    counts += [cv2.countNonZero(cv2.bitwise_and(codes, 1 << bit)) for bit in range(1, len(COLOR_RANGES))]
+    return [c / total for c in counts]
+
+def classify_ratios(ratios):
+    gp, yp, bp, wp, dp, pp = ratios
+
+    if gp > 0.45:
+        return "HEALTHY"
+    if pp > 0.10:
+        return "P_DEF"
+    if yp > 0.35:
+        return "N_DEF"
+    if yp > 0.20 and gp > 0.15:
+        return "FE_DEF"
+    if bp > 0.20:
+        return "K_DEF"
+    if wp > 0.20:
+        return "ZN_DEF"
+    if dp > 0.15:
+        return "FUNGAL"
+    return "MG_DEF"
+
+def classify_leaf(hsv):
+    return classify_ratios(color_ratios(color_codes(hsv)))
+
+# ---------------- BACKENDS ----------------
+
+class HsvDetector:
+    """Colour-ratio heuristic; works on the codes analyze_frame already built."""
+
+    name = "hsv"
+
+    def classify(self, roi, codes=None, green_mask=None):
+        if codes is None:
+            codes = color_codes(cv2.cvtColor(roi, cv2.COLOR_BGR2HSV))
+        return classify_ratios(color_ratios(codes, green_mask))
+
+    def warmup(self):
+        self.classify(np.zeros((64, 64, 3), np.uint8))
+
+
+class MicroBatcher:
+    """Collects items submitted from many request threads into small batches.
+
+    The first item opens a ``window``-second batch; whatever else arrives
+    before it closes (up to ``max_batch``) is run through ``fn`` in one call.
+    The worker thread starts lazily so it is created after a gunicorn fork.
+    """
+
+    def __init__(self, fn, max_batch=MAX_BATCH, window=BATCH_WINDOW):
+        self.fn = fn
+        self.max_batch = max_batch
+        self.window = window
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, item, timeout=10):
+        self._ensure_worker()
+        fut = Future()
+        self._queue.put((item, fut))
+        return fut.result(timeout)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                results = list(self.fn([item for item, _ in batch]))
+                if len(results) != len(batch):
+                    raise RuntimeError(f"batch of {len(batch)} returned {len(results)} results")
+                for (_, fut), result in zip(batch, results):
+                    fut.set_result(result)
+            except Exception as e:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+
+
+def yolo_status(name):
+    """Map a best.pt class name (e.g. ``Tomato_Late_blight``) to a DISEASE_DB key."""
+    name = name.lower()
+    if "healthy" in name:
+        return "HEALTHY"
+    if "virus" in name:
+        return "VIRAL"
+    if "mite" in name:
+        return "PEST"
+    if "bacterial" in name:
+        return "BACTERIAL"
+    return "FUNGAL"
+
+def export_yolo(weights, fmt):
+    """Export ``weights`` once for faster CPU inference; returns the new path.
+
+    ``onnx`` is a plain ONNX export; ``onnx-int8`` additionally applies
+    onnxruntime dynamic (weight-only) int8 quantization.
+    """
+    from ultralytics import YOLO
+
+    base = os.path.splitext(weights)[0]
+    onnx_path = base + ".onnx"
+    if not os.path.exists(onnx_path) or os.path.getmtime(onnx_path) < os.path.getmtime(weights):
+        onnx_path = YOLO(weights).export(format="onnx", imgsz=224, dynamic=True)
+    if fmt == "onnx":
+        return onnx_path
+    if fmt == "onnx-int8":
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        int8_path = base + ".int8.onnx"
+        if not os.path.exists(int8_path) or os.path.getmtime(int8_path) < os.path.getmtime(onnx_path):
+            quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QUInt8)
+        return int8_path
+    raise ValueError(f"unknown YOLO export format: {fmt}")
+
+
+class YoloDetector:
+    """best.pt leaf classifier run on CPU in micro-batches across requests.
+
+    ``classify`` blocks the calling request thread until its batch is done.
+    Returns None when the top class is below ``conf`` so the frame is
+    treated like one without a leaf.
+    """
+
+    name = "yolo"
+
+    def __init__(self, weights=YOLO_WEIGHTS, export=YOLO_EXPORT, conf=YOLO_CONF,
+                 max_batch=MAX_BATCH, window=BATCH_WINDOW):
+        from ultralytics import YOLO
+
+        if export:
+            weights = export_yolo(weights, export)
+            self.name = f"yolo-{export}"
+        self.model = YOLO(weights, task="classify")
+        self.statuses = {i: yolo_status(n) for i, n in self.model.names.items()}
+        self.conf = conf
+        self.batcher = MicroBatcher(self._predict_batch, max_batch, window)
+
+    def _predict_batch(self, rois):
+        results = self.model.predict(rois, imgsz=224, device="cpu", verbose=False)
+        return [self.statuses[r.probs.top1] if r.probs.top1conf >= self.conf else None
+                for r in results]
+
+    def classify(self, roi, codes=None, green_mask=None):
+        return self.batcher.submit(roi)
+
+    def warmup(self):
+        # Direct call, not through the batcher: this runs in the gunicorn
+        # master and must not leave a worker thread behind at fork.
+        self._predict_batch([np.zeros((224, 224, 3), np.uint8)])
+
+
+def make_detector(backend=DETECTOR_BACKEND):
+    if backend == "hsv":
+        return HsvDetector()
+    if backend == "yolo":
+        return YoloDetector()
+    raise ValueError(f"unknown DETECTOR_BACKEND: {backend}")
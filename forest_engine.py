@@ -0,0 +1,86 @@
+import numpy as np
+
+CHUNK_ROWS = 4096
+
+
+class CompiledForest:
+    """A fitted RandomForestClassifier flattened into plain node arrays.
+
+    All trees share one set of arrays (feature, threshold, left, right,
+    value); ``roots`` holds each tree's first node. Leaves point back at
+    themselves with an infinite threshold, so every row can be advanced
+    level by level with a handful of NumPy gathers and no Python per node.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, depth, classes):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.depth = depth
+        self.classes_ = classes
+
+    @classmethod
+    def from_sklearn(cls, model):
+        feature, threshold, left, right, value, roots = [], [], [], [], [], []
+        offset = 0
+        depth = 0
+        for est in model.estimators_:
+            tree = est.tree_
+            n = tree.node_count
+            ids = np.arange(n, dtype=np.int32)
+            leaf = tree.children_left == -1
+
+            roots.append(offset)
+            feature.append(np.where(leaf, 0, tree.feature).astype(np.int32))
+            threshold.append(np.where(leaf, np.inf, tree.threshold))
+            left.append(np.where(leaf, ids, tree.children_left).astype(np.int32) + offset)
+            right.append(np.where(leaf, ids, tree.children_right).astype(np.int32) + offset)
+            v = tree.value[:, 0, :]
+            value.append(v / v.sum(axis=1, keepdims=True))
+
+            depth = max(depth, tree.max_depth)
+            offset += n
+
+        return cls(
+            np.concatenate(feature),
+            np.concatenate(threshold),
+            np.concatenate(left),
+            np.concatenate(right),
+            np.concatenate(value),
+            np.array(roots, dtype=np.int32),
+            depth,
+            model.classes_,
+        )
+
+    def _leaves(self, X):
+        n, n_features = X.shape
+        n_trees = len(self.roots)
+        node = np.tile(self.roots, n)
+        flat_x = X.ravel()
+        base = np.repeat(np.arange(n) * n_features, n_trees)
+        active = np.arange(n * n_trees)
+        for _ in range(self.depth):
+            cur = node[active]
+            x = flat_x[base[active] + self.feature[cur]]
+            nxt = np.where(x <= self.threshold[cur], self.left[cur], self.right[cur])
+            node[active] = nxt
+            # Drop (row, tree) pairs that reached a leaf from the next level.
+            active = active[nxt != cur]
+            if not len(active):
+                break
+        return node.reshape(n, n_trees)
+
+    def predict_proba(self, X):
+        # sklearn compares float32 inputs against float64 thresholds; match it.
+        X = np.atleast_2d(np.asarray(X, dtype=np.float32))
+        out = np.empty((X.shape[0], self.value.shape[1]))
+        for start in range(0, X.shape[0], CHUNK_ROWS):
+            chunk = X[start:start + CHUNK_ROWS]
+            out[start:start + CHUNK_ROWS] = self.value[self._leaves(chunk)].mean(axis=1)
+        return out
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
@@ -0,0 +1,92 @@
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+
+MOTION_THRESHOLD = float(os.environ.get("MOTION_THRESHOLD", 2.0))
+MAX_SKIP = int(os.environ.get("MOTION_MAX_SKIP", 30))
+THUMB_SIZE = (64, 48)
+MAX_SESSIONS = 256
+
+
+class GateEntry:
+    """The last fully processed frame of a session (its keyframe)."""
+
+    __slots__ = ("thumb", "box", "status", "skipped", "overlay_key", "jpeg")
+
+    def __init__(self, thumb, box, status):
+        self.thumb = thumb
+        self.box = box
+        self.status = status
+        self.skipped = 0
+        self.overlay_key = None
+        self.jpeg = None
+
+
+class FrameGate:
+    """Decides per camera whether a frame is worth reprocessing.
+
+    Each frame is shrunk to a tiny grayscale thumbnail and compared with the
+    session's keyframe thumbnail. If the mean absolute difference is below
+    ``threshold`` the scene is static: the keyframe's detection is reused and,
+    when the overlay would be drawn the same, so is its encoded JPEG. Frames
+    are compared with the keyframe rather than the previous frame so slow
+    drift still triggers a refresh, and after ``max_skip`` reuses the next
+    frame is processed regardless. Entries live in this process only; another
+    worker simply has a cold cache.
+    """
+
+    def __init__(self, threshold=MOTION_THRESHOLD, max_skip=MAX_SKIP, max_sessions=MAX_SESSIONS):
+        self.threshold = threshold
+        self.max_skip = max_skip
+        self.max_sessions = max_sessions
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"frames": 0, "classified": 0, "classify_skipped": 0, "encoded": 0, "encode_skipped": 0}
+
+    @staticmethod
+    def thumbnail(frame):
+        small = cv2.resize(frame, THUMB_SIZE, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    def static_entry(self, sid, thumb):
+        """Return the session's keyframe if ``thumb`` matches it, else None."""
+        with self._lock:
+            self.stats["frames"] += 1
+            entry = self._entries.get(sid)
+            if entry is None or entry.skipped >= self.max_skip:
+                return None
+            if cv2.norm(thumb, entry.thumb, cv2.NORM_L1) / thumb.size >= self.threshold:
+                return None
+            self._entries.move_to_end(sid)
+            entry.skipped += 1
+            self.stats["classify_skipped"] += 1
+            return entry
+
+    def remember(self, sid, thumb, box, status):
+        entry = GateEntry(thumb, box, status)
+        with self._lock:
+            self.stats["classified"] += 1
+            self._entries[sid] = entry
+            self._entries.move_to_end(sid)
+            while len(self._entries) > self.max_sessions:
+                self._entries.popitem(last=False)
+        return entry
+
+    def cached_jpeg(self, entry, overlay_key):
+        with self._lock:
+            if entry.jpeg is not None and entry.overlay_key == overlay_key:
+                self.stats["encode_skipped"] += 1
+                return entry.jpeg
+            return None
+
+    def store_jpeg(self, entry, overlay_key, jpeg):
+        with self._lock:
+            self.stats["encoded"] += 1
+            entry.overlay_key = overlay_key
+            entry.jpeg = jpeg
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, sessions=len(self._entries))
@@ -0,0 +1,74 @@
+"""Production gunicorn settings for the scanner.
+
+    gunicorn -c gunicorn.conf.py "real_time_detection:create_app()"
+
+One worker process per available core, each with threads (gthread) for
+the long-lived SSE, long-poll and MJPEG connections. The app is loaded
+once in the master and forked, so models and lookup tables are shared
+copy-on-write. OpenCV, BLAS and torch get cores // workers threads each so
+the pool doesn't oversubscribe the machine.
+
+With several workers, voting state moves to SQLite, so /process_frame*
+and the detection events work on whichever worker gets the request. The
+/stream pipeline and /video_feed keep frames in one process, so they are
+off (LIVE_STREAM=0) and the Live page posts each frame to
+/process_frame_raw instead. WEB_CONCURRENCY=1 (or LIVE_STREAM=1 behind
+routing that is sticky per session) turns them back on.
+
+Each open Live page holds a thread per long-lived connection: the events
+stream, plus the MJPEG feed when streaming. Threads are sized for
+MAX_VIEWERS pages per worker, since viewers need not spread evenly, plus a
+few for uploads and the JSON API.
+
+Everything can be overridden from the environment: WEB_CONCURRENCY
+(workers), MAX_VIEWERS, GUNICORN_THREADS, CV_THREADS, LIVE_STREAM, PORT.
+"""
+import gc
+import os
+import sys
+
+
+def _cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+CORES = _cores()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8000)}"
+MAX_VIEWERS = int(os.environ.get("MAX_VIEWERS", 16))
+
+workers = int(os.environ.get("WEB_CONCURRENCY", CORES))
+worker_class = "gthread"
+preload_app = True
+timeout = 60
+
+CV_THREADS = int(os.environ.get("CV_THREADS", max(1, CORES // workers)))
+
+# Set before the master imports NumPy/OpenCV/torch so their pools start small.
+for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(var, str(CV_THREADS))
+
+# Voting state has to be shared once requests from one camera can land on
+# different workers; the frame pipeline cannot be, so it is turned off.
+if workers > 1:
+    os.environ.setdefault("SESSION_BACKEND", "sqlite")
+    os.environ.setdefault("LIVE_STREAM", "0")
+
+LONG_LIVED_PER_VIEWER = 2 if os.environ.get("LIVE_STREAM", "1") not in ("", "0", "false") else 1
+threads = int(os.environ.get("GUNICORN_THREADS", LONG_LIVED_PER_VIEWER * MAX_VIEWERS + 4 * CV_THREADS))
+
+
+def when_ready(server):
+    # The app is loaded; freeze it out of the cyclic GC so collections in
+    # the workers don't write to (and so un-share) those objects' pages.
+    gc.collect()
+    gc.freeze()
+
+def post_fork(server, worker):
+    import cv2
+    cv2.setNumThreads(CV_THREADS)
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(CV_THREADS)
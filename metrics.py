@@ -0,0 +1,250 @@
+"""Minimal Prometheus-style metrics, a stage timer and a sampling profiler.
+
+Metrics are on unless METRICS_ENABLED=0; when off, ``timer`` hands back a
+shared no-op context manager and nothing is recorded. The profiler hook is
+off unless PROFILE_SAMPLE_RATE > 0, in which case ``profiled`` wraps a
+function so that roughly that fraction of its calls is run under cProfile
+and dumped to PROFILE_DIR. With the rate at 0 the decorator returns the
+function itself.
+
+Values are per process: under gunicorn each worker reports its own.
+"""
+import bisect
+import cProfile
+import functools
+import os
+import random
+import threading
+import time
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ENABLED = os.environ.get("METRICS_ENABLED", "1") not in ("", "0", "false")
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+
+_registry = []
+
+
+def _fmt_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, doc, labelnames=()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._child())
+        return child
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class _Value:
+    __slots__ = ("value", "fn", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self.fn = None
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set(self, value):
+        self.value = value
+
+    def set_function(self, fn):
+        self.fn = fn
+
+    def get(self):
+        return self.fn() if self.fn else self.value
+
+
+class Counter(_Metric):
+    kind = "counter"
+    _child = _Value
+
+    def _render_child(self, values, child):
+        yield f"{self.name}{_fmt_labels(self.labelnames, values)} {child.get()}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+
+class _Buckets:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, doc, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, doc, labelnames)
+
+    def _child(self):
+        return _Buckets(self.buckets)
+
+    def _render_child(self, values, child):
+        running = 0
+        for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+            running += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            yield f"{self.name}_bucket{_fmt_labels(self.labelnames, values, [('le', le)])} {running}"
+        yield f"{self.name}_sum{_fmt_labels(self.labelnames, values)} {child.sum}"
+        yield f"{self.name}_count{_fmt_labels(self.labelnames, values)} {running}"
+
+
+def render():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# ---------------- SHARED METRICS ----------------
+
+STAGE_SECONDS = Histogram("stage_duration_seconds", "Time spent in each processing stage.", ["stage"])
+REQUESTS = Counter("http_requests_total", "HTTP requests by endpoint and status.", ["endpoint", "status"])
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "HTTP request latency by endpoint.", ["endpoint"])
+ACTIVE_SESSIONS = Gauge("active_sessions", "Scanner sessions currently held by this worker's store.")
+MODEL_LOAD_SECONDS = Gauge("model_load_seconds", "Time the last model bundle took to load or train.", ["source"])
+
+
+class _Timer:
+    __slots__ = ("child", "start")
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.start)
+
+
+_NULL = nullcontext()
+
+def timer(stage):
+    """``with timer("imdecode"): ...`` records into stage_duration_seconds."""
+    if not ENABLED:
+        return _NULL
+    return _Timer(STAGE_SECONDS.labels(stage))
+
+# ---------------- PROFILER HOOK ----------------
+
+_profile_lock = threading.Lock()
+
+def profiled(name, rate=None):
+    rate = PROFILE_SAMPLE_RATE if rate is None else rate
+
+    def decorate(fn):
+        if rate <= 0:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            # One profile at a time: the interpreter allows a single active profiler.
+            if random.random() >= rate or not _profile_lock.acquire(blocking=False):
+                return fn(*args, **kwargs)
+            try:
+                prof = cProfile.Profile()
+                result = prof.runcall(fn, *args, **kwargs)
+                os.makedirs(PROFILE_DIR, exist_ok=True)
+                prof.dump_stats(os.path.join(PROFILE_DIR, f"{name}-{os.getpid()}-{time.time_ns()}.prof"))
+                return result
+            finally:
+                _profile_lock.release()
+        return wrapper
+    return decorate
+
+# ---------------- EXPOSITION ----------------
+
+def init_flask(app):
+    """Add request counting/latency hooks and a /metrics route to ``app``."""
+    from flask import Response, g, request
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(render(), mimetype=CONTENT_TYPE)
+
+    if not ENABLED:
+        return
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record(response):
+        start = g.pop("metrics_start", None)
+        endpoint = request.endpoint or "unknown"
+        if start is not None:
+            REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - start)
+        REQUESTS.labels(endpoint, str(response.status_code)).inc()
+        return response
+
+_server = None
+_server_lock = threading.Lock()
+
+def serve(port):
+    """Expose /metrics on ``port`` from a background thread (once per process)."""
+    global _server
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+    return _server
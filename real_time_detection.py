@@ -2,16 +2,32 @@ import cv2
 import numpy as np
 import time
 import base64
-from collections import deque
+import json
 from flask import Flask, Response, jsonify, request, render_template
 from flask_cors import CORS
 import os
+from collections import namedtuple
+
+from detection_state import DetectionSession, make_store
+from detectors import GREEN_BIT, color_codes, make_detector
+from frame_gate import FrameGate
+from metrics import ACTIVE_SESSIONS, init_flask, profiled, timer
+from soil_model import get_model_bundle
+from stream_pipeline import StreamPipeline
+from toxicity_service import toxicity_api
 
 app = Flask(__name__)
 CORS(app)
+app.register_blueprint(toxicity_api)
+init_flask(app)
 
 DISPLAY_DURATION = 10
 VOTE_FRAMES = 7
+ADAPTIVE_MODE = os.environ.get("ADAPTIVE_MODE", "0")
+# The /stream pipeline keeps frames in this process, so it only works when
+# one process serves every request (gunicorn.conf.py turns it off with
+# several workers; the Live page then posts to /process_frame_raw).
+LIVE_STREAM = os.environ.get("LIVE_STREAM", "1")
 
 DISEASE_DB = {
     "HEALTHY": {
@@ -61,139 +77,355 @@ DISEASE_DB = {
         "fert": ["Spray: Mancozeb","Reduce humidity"],
         "tip": "Dark or rust spots indicate fungal disease.",
         "color": (0,0,255)
+    },
+    "VIRAL": {
+        "title": "STATUS: VIRAL INFECTION",
+        "fert": ["Remove infected leaves","Control whitefly / aphids"],
+        "tip": "Curling or mosaic patterns indicate a viral disease.",
+        "color": (255,0,255)
+    },
+    "PEST": {
+        "title": "STATUS: MITE INFESTATION",
+        "fert": ["Spray: Neem oil","Increase humidity"],
+        "tip": "Fine speckling and webbing indicate spider mites.",
+        "color": (0,165,255)
+    },
+    "BACTERIAL": {
+        "title": "STATUS: BACTERIAL SPOT",
+        "fert": ["Spray: Copper hydroxide","Avoid overhead watering"],
+        "tip": "Small dark water-soaked spots indicate bacterial spot.",
+        "color": (60,20,220)
     }
 }
 
-current_state = "IDLE"
-active_info = None
-current_recommendation = {"plant":"Scanning...","disease":"None","solution":"Align Leaf"}
-last_leaf_time = 0
-status_history = deque(maxlen=VOTE_FRAMES)
+IDLE_RECOMMENDATION = {"plant":"Scanning...","disease":"None","solution":"Align Leaf"}
+
+sessions = make_store(lambda: DetectionSession(VOTE_FRAMES))
+ACTIVE_SESSIONS.labels().set_function(sessions.count)
+detector = make_detector()
+gate = FrameGate()
+
+def session_id():
+    return request.args.get("session") or request.headers.get("X-Session-ID") or "default"
+
+def recommendation(sess):
+    if sess.status is None:
+        return IDLE_RECOMMENDATION
+    info = DISEASE_DB[sess.status]
+    return {"plant":"LEAF","disease":info['title'],"solution":info['tip']}
 
 # ---------------- UI DRAW ----------------
 
+PANEL_W = 400
+MAX_CACHED_PANELS = 64
+_panel_cache = {}
+
+def _panel_text(img, bx, state, info, color, ink=None):
+    # ink overrides every colour so the same call renders the text mask.
+    c = lambda col: col if ink is None else ink
+    cv2.putText(img,"PLANT SCANNER",(bx,50),1,1.5,c((200,200,200)),2)
+
+    if state=="LOCKED" and info:
+        cv2.putText(img,info['title'],(bx,120),1,1.2,c(color),2)
+        cv2.putText(img,"ACTION:",(bx,180),1,1.1,c((255,255,255)),1)
+        y=220
+        for f in info['fert']:
+            cv2.putText(img,"> "+f,(bx,y),1,1.0,c((200,200,200)),1)
+            y+=35
+        cv2.putText(img,info['tip'],(bx,y+20),1,0.9,c(color),1)
+    else:
+        cv2.putText(img,"PLACE A LEAF",(bx,120),1,1.5,c((0,0,255)),2)
+
+def _panel(h, w, state, info, color):
+    """Pre-rendered side panel for one frame size and status.
+
+    Returns the panel's left edge, the flat dark background it is blended
+    with, and the text as a sparse sprite: coordinates of the pixels the
+    text touches, their (1 - alpha) and their alpha-premultiplied colour.
+    The alpha comes from rendering the same text as a white mask, so
+    anti-aliased edges blend like putText does; without anti-aliasing the
+    result is pixel-identical.
+    """
+    locked = state=="LOCKED" and bool(info)
+    key = (h, w, locked, info['title'] if locked else None)
+    panel = _panel_cache.get(key)
+    if panel is None:
+        x0 = max(w-PANEL_W, 0)
+        bg = np.full((h, w-x0, 3), 20, np.uint8)
+        sprite = np.zeros_like(bg)
+        mask = np.zeros((h, w-x0), np.uint8)
+        _panel_text(sprite, w-370-x0, state, info, color)
+        _panel_text(mask, w-370-x0, state, info, color, ink=255)
+        ys, xs = np.nonzero(mask)
+        alpha = mask[ys, xs, None].astype(np.float32) / 255
+        if len(_panel_cache) >= MAX_CACHED_PANELS:
+            _panel_cache.clear()
+        panel = _panel_cache[key] = (x0, bg, ys, xs, 1 - alpha, sprite[ys, xs].astype(np.float32) + 0.5)
+    return panel
+
+@profiled("draw_ui")
 def draw_ui(frame, box, state, info, debug_text=""):
     x1,y1,x2,y2 = box
     h,w = frame.shape[:2]
 
-    overlay = frame.copy()
-    cv2.rectangle(overlay,(w-400,0),(w,h),(20,20,20),-1)
-    cv2.addWeighted(overlay,0.7,frame,0.3,0,frame)
-
     color=(0,255,255)
     if state=="LOCKED" and info:
         color=info['color']
     if state=="IDLE":
         color=(0,0,255)
 
+    # Darken only the panel region, in place; same arithmetic as blending a
+    # dark rectangle over a full-frame copy, without touching the rest.
+    x0, bg, ys, xs, inv_alpha, ink = _panel(h, w, state, info, color)
+    region = frame[:, x0:]
+    cv2.addWeighted(bg,0.7,region,0.3,0,dst=region)
+
     l=40
     cv2.line(frame,(x1,y1),(x1+l,y1),color,3)
     cv2.line(frame,(x1,y1),(x1,y1+l),color,3)
     cv2.line(frame,(x2,y2),(x2-l,y2),color,3)
     cv2.line(frame,(x2,y2),(x2,y2-l),color,3)
 
-    bx=w-370
-    cv2.putText(frame,"PLANT SCANNER",(bx,50),1,1.5,(200,200,200),2)
-
-    if state=="LOCKED" and info:
-        cv2.putText(frame,info['title'],(bx,120),1,1.2,color,2)
-        cv2.putText(frame,"ACTION:",(bx,180),1,1.1,(255,255,255),1)
-        y=220
-        for f in info['fert']:
-            cv2.putText(frame,"> "+f,(bx,y),1,1.0,(200,200,200),1)
-            y+=35
-        cv2.putText(frame,info['tip'],(bx,y+20),1,0.9,color,1)
-    else:
-        cv2.putText(frame,"PLACE A LEAF",(bx,120),1,1.5,(0,0,255),2)
+    # Composite the cached text over just the pixels it covers.
+    region[ys, xs] = (region[ys, xs] * inv_alpha + ink).astype(np.uint8)
 
     return frame
 
-# ---------------- DETECTION ----------------
-
-def classify_leaf(hsv):
-    green = cv2.inRange(hsv,(25,40,40),(90,255,255))
-    yellow = cv2.inRange(hsv,(15,50,50),(35,255,255))
-    brown = cv2.inRange(hsv,(5,50,20),(15,255,200))
-    white = cv2.inRange(hsv,(0,0,200),(180,40,255))
-    dark = cv2.inRange(hsv,(0,0,0),(180,255,50))
-    purple = cv2.inRange(hsv,(125,50,50),(160,255,255))
-
-    total = hsv.shape[0]*hsv.shape[1]
-
-    gp = cv2.countNonZero(green)/total
-    yp = cv2.countNonZero(yellow)/total
-    bp = cv2.countNonZero(brown)/total
-    wp = cv2.countNonZero(white)/total
-    dp = cv2.countNonZero(dark)/total
-    pp = cv2.countNonZero(purple)/total
-
-    if gp > 0.45:
-        return "HEALTHY"
-    if pp > 0.10:
-        return "P_DEF"
-    if yp > 0.35:
-        return "N_DEF"
-    if yp > 0.20 and gp > 0.15:
-        return "FE_DEF"
-    if bp > 0.20:
-        return "K_DEF"
-    if wp > 0.20:
-        return "ZN_DEF"
-    if dp > 0.15:
-        return "FUNGAL"
-    return "MG_DEF"
-
 # ---------------- FRAME PROCESSING ----------------
 
-@app.route('/process_frame', methods=['POST'])
-def process_frame():
-    global current_state, active_info, current_recommendation, last_leaf_time
-
-    data = request.json['image']
-    encoded = data.split(',')[1]
-    nparr = np.frombuffer(base64.b64decode(encoded), np.uint8)
-    frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    frame = cv2.flip(frame,1)
-
+@profiled("detect_leaf")
+def detect_leaf(frame):
     box_s=400
     x1,y1=100,(frame.shape[0]-box_s)//2
     x2,y2=x1+box_s,y1+box_s
     roi=frame[y1:y2,x1:x2]
 
-    hsv=cv2.cvtColor(roi,cv2.COLOR_BGR2HSV)
-    green_mask = cv2.inRange(hsv,(25,40,40),(90,255,255))
-    contours,_ = cv2.findContours(green_mask,cv2.RETR_EXTERNAL,cv2.CHAIN_APPROX_SIMPLE)
+    with timer("leaf_mask"):
+        hsv=cv2.cvtColor(roi,cv2.COLOR_BGR2HSV)
+        codes = color_codes(hsv)
+        green_mask = cv2.bitwise_and(codes, GREEN_BIT)
+        contours,_ = cv2.findContours(green_mask,cv2.RETR_EXTERNAL,cv2.CHAIN_APPROX_SIMPLE)
 
+    status = None
     if len(contours)>0 and cv2.contourArea(max(contours,key=cv2.contourArea))>5000:
-        last_leaf_time=time.time()
-        status = classify_leaf(hsv)
-        status_history.append(status)
-        final_status = max(set(status_history), key=status_history.count)
-
-        active_info = DISEASE_DB[final_status]
-        current_state="LOCKED"
-        current_recommendation={
-            "plant":"LEAF",
-            "disease":active_info['title'],
-            "solution":active_info['tip']
-        }
+        with timer("classify_leaf"):
+            status = detector.classify(roi, codes, green_mask)
+
+    return (x1,y1,x2,y2), status
+
+def update_session(sess, status):
+    before = sess.status
+    if status is not None:
+        sess.last_leaf_time=time.time()
+        sess.history.append(status)
+        sess.status = max(set(sess.history), key=sess.history.count)
+        sess.state="LOCKED"
     else:
-        if time.time()-last_leaf_time > DISPLAY_DURATION:
-            current_state="IDLE"
-            active_info=None
-            current_recommendation={"plant":"Scanning...","disease":"None","solution":"Align Leaf"}
-            status_history.clear()
-
-    frame=draw_ui(frame,(x1,y1,x2,y2),current_state,active_info)
+        if time.time()-sess.last_leaf_time > DISPLAY_DURATION:
+            sess.reset()
+    if sess.status != before:
+        sess.version += 1
+
+def active_info(sess):
+    return DISEASE_DB[sess.status] if sess.status else None
+
+def detection_json(box, sess):
+    result = {"state": sess.state, "status": sess.status, "box": list(box)}
+    info = active_info(sess)
+    if info:
+        result.update({"title": info['title'], "fert": info['fert'],
+                       "tip": info['tip'], "color": info['color']})
+    return result
+
+def enabled(flag):
+    return flag not in ("", "0", "false")
+
+def adaptive_mode():
+    return enabled(request.args.get("adaptive", ADAPTIVE_MODE))
+
+Analysis = namedtuple("Analysis", "box state info detection entry static")
+
+def analyze_frame(frame, sid, adaptive=False):
+    """Detect and vote on one mirrored frame for session ``sid``.
+
+    In adaptive mode a static scene reuses the keyframe's detection.
+    """
+    entry = static = None
+    if adaptive:
+        thumb = gate.thumbnail(frame)
+        entry = static = gate.static_entry(sid, thumb)
+        if static:
+            box, status = entry.box, entry.status
+        else:
+            box, status = detect_leaf(frame)
+            entry = gate.remember(sid, thumb, box, status)
+    else:
+        box, status = detect_leaf(frame)
+
+    with sessions.session(sid) as sess:
+        update_session(sess, status)
+        detection = detection_json(box, sess)
+        state, info = sess.state, active_info(sess)
+    return Analysis(box, state, info, detection, entry, static)
+
+def render_frame(frame, a):
+    """Draw the overlay and encode to JPEG, reusing the keyframe's JPEG for
+    a static scene whose overlay has not changed."""
+    overlay_key = (a.state, a.detection["status"])
+    if a.static:
+        jpeg = gate.cached_jpeg(a.entry, overlay_key)
+        if jpeg is not None:
+            return jpeg
+
+    with timer("draw_ui"):
+        frame=draw_ui(frame,a.box,a.state,a.info)
+    with timer("imencode"):
+        _,buffer=cv2.imencode('.jpg',frame)
+    jpeg = buffer.tobytes()
+    if a.entry is not None:
+        gate.store_jpeg(a.entry, overlay_key, jpeg)
+    return jpeg
+
+def handle_frame(frame, render=True):
+    a = analyze_frame(frame, session_id(), adaptive_mode())
+    return a.detection, render_frame(frame, a) if render else None
+
+# Legacy transport: base64 data-URL in, base64 JPEG in JSON out.
+@app.route('/process_frame', methods=['POST'])
+def process_frame():
+    data = request.json['image']
+    encoded = data.split(',')[1]
+    with timer("b64decode"):
+        nparr = np.frombuffer(base64.b64decode(encoded), np.uint8)
+    with timer("imdecode"):
+        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    frame = cv2.flip(frame,1)
 
-    _,buffer=cv2.imencode('.jpg',frame)
-    img_base64 = base64.b64encode(buffer).decode('utf-8')
+    _, jpeg = handle_frame(frame)
+    with timer("b64encode"):
+        img_base64 = base64.b64encode(jpeg).decode('utf-8')
 
     return jsonify({"image": img_base64})
 
+# Binary transport: raw JPEG body in; annotated JPEG bytes out, or with
+# ?output=json only the detection, for clients that draw their own overlay.
+@app.route('/process_frame_raw', methods=['POST'])
+def process_frame_raw():
+    nparr = np.frombuffer(request.get_data(), np.uint8)
+    with timer("imdecode"):
+        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR) if nparr.size else None
+    if frame is None:
+        return jsonify({"error": "body must be a JPEG/PNG image"}), 400
+    frame = cv2.flip(frame,1)
+
+    if request.args.get("output") == "json":
+        return jsonify(handle_frame(frame, render=False)[0])
+    _, jpeg = handle_frame(frame)
+    return Response(jpeg, mimetype="image/jpeg")
+
+# ---------------- STREAMING ----------------
+
+def _decode_stage(sid, data):
+    with timer("imdecode"):
+        frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    return None if frame is None else cv2.flip(frame,1)
+
+def _classify_stage(sid, frame):
+    return frame, analyze_frame(frame, sid, enabled(ADAPTIVE_MODE))
+
+def _encode_stage(sid, item):
+    return render_frame(*item)
+
+def waiting_frame(w=640, h=480):
+    frame = np.zeros((h, w, 3), np.uint8)
+    cv2.putText(frame, "WAITING FOR CAMERA", (w//2 - 170, h//2),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.9, (200, 200, 200), 2)
+    return cv2.imencode('.jpg', frame)[1].tobytes()
+
+# OpenCV releases the GIL in decode/convert/encode, so threads use extra cores.
+stream = StreamPipeline([
+    ("decode", _decode_stage, 1),
+    ("classify", _classify_stage, max(1, (os.cpu_count() or 2)//2)),
+    ("encode", _encode_stage, max(1, (os.cpu_count() or 2)//2)),
+], placeholder=waiting_frame())
+
+def stream_off():
+    return jsonify({"error": "live streaming is off on this server; post frames to /process_frame_raw"}), 404
+
+# Cameras push raw JPEG frames here and get an immediate 202; frames the
+# pipeline cannot keep up with are dropped, never queued.
+@app.route('/stream/frame', methods=['POST'])
+def stream_frame():
+    if not enabled(LIVE_STREAM):
+        return stream_off()
+    data = request.get_data()
+    if not data:
+        return jsonify({"error": "body must be a JPEG/PNG image"}), 400
+    return jsonify({"seq": stream.push(session_id(), data)}), 202
+
+# MJPEG feed of the session's annotated frames, usable as an <img> src.
+@app.route('/video_feed')
+def video_feed():
+    if not enabled(LIVE_STREAM):
+        return stream_off()
+    def mjpeg(frames):
+        for jpeg in frames:
+            yield b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + jpeg + b"\r\n"
+    return Response(mjpeg(stream.frames(session_id())),
+                    mimetype="multipart/x-mixed-replace; boundary=frame")
+
+@app.route('/stream_stats')
+def stream_stats():
+    return jsonify(stream.stats())
+
+@app.route('/scanner_stats')
+def scanner_stats():
+    return jsonify(gate.snapshot())
+
+# ---------------- DETECTION DATA ----------------
+
+# Dashboards poll this. The payload only depends on the session's status, so
+# it carries the session version and an ETag; an unchanged result is a 304.
+# With ?wait=N (long-poll) an unchanged result holds the request until the
+# status changes or N seconds pass. /detection_events pushes the same
+# payload as server-sent events, one event per status change.
+MAX_WAIT = 30
+SSE_HEARTBEAT = 15
+
+def detection_payload(sess):
+    return json.dumps({**recommendation(sess), "version": sess.version})
+
 @app.route('/detection_data')
 def detection_data():
-    return jsonify(current_recommendation)
+    sid = session_id()
+    sess = sessions.get(sid)
+    wait = min(request.args.get("wait", 0, type=float), MAX_WAIT)
+    if wait > 0 and sess.etag() in request.if_none_match:
+        sess = sessions.wait(sid, sess.version, wait)
+    if sess.etag() in request.if_none_match:
+        resp = Response(status=304)
+    else:
+        resp = Response(detection_payload(sess), mimetype="application/json")
+    resp.set_etag(sess.etag())
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+@app.route('/detection_events')
+def detection_events():
+    sid = session_id()
+
+    def events():
+        version = None
+        while True:
+            sess = sessions.get(sid) if version is None else sessions.wait(sid, version, SSE_HEARTBEAT)
+            if sess.version == version:
+                yield ": keep-alive\n\n"
+                continue
+            version = sess.version
+            yield f"id: {sess.version}\ndata: {detection_payload(sess)}\n\n"
+
+    return Response(events(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.route('/')
 def index():
@@ -211,6 +443,30 @@ def project():
 def about():
     return render_template("about.html")
 
+# ---------------- APP FACTORY ----------------
+
+PRELOAD_FRAME_SIZES = [(480, 640), (720, 1280)]
+
+def create_app():
+    """Return ``app`` with the heavy state built up front.
+
+    gunicorn.conf.py calls this once in the master before forking
+    (preload_app), so the soil model bundle, detector weights and the
+    pre-rendered panel sprites are shared copy-on-write by every worker
+    instead of being built again in each one.
+    """
+    try:
+        get_model_bundle()
+    except FileNotFoundError:
+        pass
+    detector.warmup()
+    states = [("IDLE", None), ("SCANNING", None)] + [("LOCKED", info) for info in DISEASE_DB.values()]
+    for h, w in PRELOAD_FRAME_SIZES:
+        y1 = (h-400)//2
+        for state, info in states:
+            draw_ui(np.zeros((h, w, 3), np.uint8), (100, y1, 500, y1+400), state, info)
+    return app
+
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))
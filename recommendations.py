@@ -0,0 +1,92 @@
+import numpy as np
+
+from soil_model import FEATURES
+
+# (code, feature, op, threshold) -- order is the order advice is shown in.
+RULES = [
+    ("LIME",    "pH",                "<", 5.5),
+    ("SULFUR",  "pH",                ">", 7.5),
+    ("UREA",    "Nitrogen",          "<", 1.5),
+    ("SSP",     "Phosphorus",        "<", 1.0),
+    ("POTASH",  "Potassium",         "<", 1.5),
+    ("MANURE",  "OrganicMatter",     "<", 3.0),
+    ("IRRIGATE", "SoilMoisture",     "<", 40),
+    ("NEEM",    "PestMortalityRate", "<", 75),
+    ("NPK",     "PlantHealthIndex",  "<", 80),
+]
+CODES = [r[0] for r in RULES]
+
+MESSAGES = {
+    "English": {
+        "LIME": "🧪 Add lime to reduce acidity.",
+        "SULFUR": "🧪 Add sulfur or compost to lower alkalinity.",
+        "UREA": "🌬️ Use urea or ammonium sulfate.",
+        "SSP": "🔥 Apply single super phosphate.",
+        "POTASH": "🪨 Use muriate of potash or composted banana peels.",
+        "MANURE": "🌿 Add organic manure or vermicompost.",
+        "IRRIGATE": "💧 Improve irrigation or add mulch.",
+        "NEEM": "⚔️ Use neem-based biopesticides.",
+        "NPK": "🌟 Apply balanced NPK and monitor stress.",
+    },
+    "தமிழ்": {
+        "LIME": "🧪 அமிலத்தன்மையை குறைக்க சுண்ணாம்பு சேர்க்கவும்.",
+        "SULFUR": "🧪 காரத்தன்மையை குறைக்க சல்பர் அல்லது கம்போஸ்ட் சேர்க்கவும்.",
+        "UREA": "🌬️ யூரியா அல்லது அமோனியம் சல்பேட் பயன்படுத்தவும்.",
+        "SSP": "🔥 சிங்கிள் சூப்பர் பாஸ்பேட் பயன்படுத்தவும்.",
+        "POTASH": "🪨 முரியேட் ஆஃப் பொட்டாஷ் அல்லது வாழைப்பழ தோல் கம்போஸ்ட் பயன்படுத்தவும்.",
+        "MANURE": "🌿 இயற்கை உரம் அல்லது வெர்மி கம்போஸ்ட் சேர்க்கவும்.",
+        "IRRIGATE": "💧 நீர்ப்பாசனத்தை மேம்படுத்தவும் அல்லது மல்ச் பயன்படுத்தவும்.",
+        "NEEM": "⚔️ வேப்பை அடிப்படையிலான உயிர் பூச்சிக்கொல்லிகளை பயன்படுத்தவும்.",
+        "NPK": "🌟 சமநிலை NPK உரம் பயன்படுத்தி செடி அழுத்தத்தை கண்காணிக்கவும்.",
+    },
+}
+
+_COLS = np.array([FEATURES.index(r[1]) for r in RULES])
+_THRESHOLDS = np.array([r[3] for r in RULES], dtype=float)
+_IS_LESS = np.array([r[2] == "<" for r in RULES])
+_BIT_VALUES = 1 << np.arange(len(RULES), dtype=np.uint16)
+
+# ---------------- EVALUATION ----------------
+
+def _as_matrix(X):
+    if hasattr(X, "columns"):
+        X = X[FEATURES].to_numpy()
+    return np.atleast_2d(np.asarray(X, dtype=float))
+
+def rule_masks(X):
+    """Boolean (n_rows, n_rules) matrix: which rule fires for which row.
+
+    ``X`` is a DataFrame with the FEATURES columns or an array in FEATURES
+    order. Every rule is one comparison over a whole column.
+    """
+    cols = _as_matrix(X)[:, _COLS]
+    return np.where(_IS_LESS, cols < _THRESHOLDS, cols > _THRESHOLDS)
+
+def recommendation_bits(X):
+    """Pack each row's fired rules into one integer (bit i = RULES[i])."""
+    return rule_masks(X).astype(np.uint16) @ _BIT_VALUES
+
+def decode_bits(bits):
+    return [code for i, code in enumerate(CODES) if int(bits) >> i & 1]
+
+def localize(codes, language="English"):
+    messages = MESSAGES[language]
+    return [messages[c] for c in codes]
+
+def format_recommendations(bits, language=None, sep=";"):
+    """Render packed rule bits as one string per row.
+
+    Codes are joined with ``sep`` unless a ``language`` is given, in which
+    case the localized messages are. Only the distinct bit patterns (a few
+    hundred at most) are formatted; rows are filled in by index.
+    """
+    uniq, inverse = np.unique(np.asarray(bits), return_inverse=True)
+    rendered = []
+    for b in uniq:
+        codes = decode_bits(b)
+        rendered.append(sep.join(localize(codes, language) if language else codes))
+    return np.array(rendered, dtype=object)[inverse.reshape(-1)]
+
+def recommend_fertilizer(pH, N, P, K, OM, SM, PMR, PHI, language="English"):
+    bits = recommendation_bits([pH, N, P, K, OM, SM, PMR, PHI])[0]
+    return localize(decode_bits(bits), language)
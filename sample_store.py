@@ -0,0 +1,42 @@
+"""Append-only Parquet store for labelled soil samples.
+
+Every ingest writes one immutable part file, so writers never touch each
+other's data and readers never see a half-written part (it is written under
+a temporary name and renamed into place). Each row carries a ``holdout``
+flag drawn at ingest time; held-out rows are only ever used for scoring.
+"""
+import os
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+SAMPLES_DIR = os.environ.get("SOIL_SAMPLES_DIR", os.path.join("data", "samples"))
+HOLDOUT_FRACTION = float(os.environ.get("HOLDOUT_FRACTION", 0.2))
+
+
+def append_samples(df, samples_dir=SAMPLES_DIR, seed=None):
+    """Write ``df`` as a new part and return the part's file name."""
+    os.makedirs(samples_dir, exist_ok=True)
+    df = df.reset_index(drop=True).copy()
+    df["holdout"] = np.random.default_rng(seed).random(len(df)) < HOLDOUT_FRACTION
+    # Zero-padded time first so a directory listing is in ingest order.
+    name = f"part-{time.time_ns():020d}-{uuid.uuid4().hex[:8]}.parquet"
+    tmp = os.path.join(samples_dir, "." + name + ".tmp")
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, os.path.join(samples_dir, name))
+    return name
+
+def list_parts(samples_dir=SAMPLES_DIR):
+    try:
+        names = os.listdir(samples_dir)
+    except FileNotFoundError:
+        return []
+    return sorted(n for n in names if n.startswith("part-") and n.endswith(".parquet"))
+
+def read_parts(parts, samples_dir=SAMPLES_DIR, columns=None):
+    if not parts:
+        return None
+    return pd.concat([pd.read_parquet(os.path.join(samples_dir, p), columns=columns) for p in parts],
+                     ignore_index=True)
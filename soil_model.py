@@ -0,0 +1,388 @@
+import copy
+import fcntl
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score, precision_score
+from sklearn.preprocessing import LabelEncoder
+
+from forest_engine import CompiledForest
+from metrics import MODEL_LOAD_SECONDS, timer
+from sample_store import HOLDOUT_FRACTION, SAMPLES_DIR, list_parts, read_parts
+
+DATA_PATH = os.environ.get("SOIL_DATA_PATH", "fertilizer_ph_data.csv")
+MODEL_PATH = os.environ.get("SOIL_MODEL_PATH", os.path.join("models", "soil_model.joblib"))
+
+BUNDLE_VERSION = 3
+
+# Incremental updates: "warm" grows the forest with trees fitted on the new
+# samples (plus a replay of older rows), keeping the newest MAX_TREES;
+# "window" refits from scratch on the latest WINDOW_ROWS training rows.
+RETRAIN_MODE = os.environ.get("RETRAIN_MODE", "warm")
+N_ESTIMATORS = 100
+TREES_PER_UPDATE = int(os.environ.get("TREES_PER_UPDATE", 25))
+MAX_TREES = int(os.environ.get("MAX_TREES", 300))
+REPLAY_RATIO = 4.0
+MIN_UPDATE_ROWS = int(os.environ.get("MIN_UPDATE_ROWS", 2000))
+# Percentage points of held-out accuracy an update may lose and still ship;
+# below ~1 point the check mostly rejects sampling noise.
+MAX_REGRESSION = float(os.environ.get("MAX_REGRESSION", 1.0))
+WINDOW_ROWS = int(os.environ.get("WINDOW_ROWS", 20_000))
+# The compiled engine wins on a few rows; from a few hundred up sklearn's
+# batched traversal is faster, so larger inputs go to the sklearn forest.
+ENGINE_MAX_ROWS = 64
+
+log = logging.getLogger(__name__)
+
+FEATURES = [
+    "pH", "Nitrogen", "Phosphorus", "Potassium",
+    "OrganicMatter", "SoilMoisture", "PestMortalityRate", "PlantHealthIndex",
+]
+TARGET = "Toxicity"
+
+# Input ranges used by the Streamlit sliders.
+FEATURE_RANGES = {
+    "pH": (3.0, 9.0), "Nitrogen": (0.0, 5.0), "Phosphorus": (0.0, 5.0), "Potassium": (0.0, 5.0),
+    "OrganicMatter": (0.0, 10.0), "SoilMoisture": (0, 100), "PestMortalityRate": (0, 100), "PlantHealthIndex": (0, 100),
+}
+
+_lock = threading.Lock()
+_cache = {"bundle": None, "stat": None, "model_stat": None, "hash": None}
+
+# ---------------- TRAINING ----------------
+
+def data_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def load_training_data(path=DATA_PATH, samples_dir=SAMPLES_DIR, parts=None):
+    """The CSV followed by every stored sample part, with a ``holdout`` column.
+
+    CSV rows are held out by a fixed-seed draw per row position, so rows
+    appended to the CSV later never move existing rows between the splits.
+    """
+    frames = []
+    if os.path.exists(path):
+        data = pd.read_csv(path)[FEATURES + [TARGET]]
+        data["holdout"] = np.random.default_rng(42).random(len(data)) < HOLDOUT_FRACTION
+        frames.append(data)
+    samples = read_parts(list_parts(samples_dir) if parts is None else parts, samples_dir)
+    if samples is not None:
+        frames.append(samples[FEATURES + [TARGET, "holdout"]])
+    if not frames:
+        raise FileNotFoundError(path)
+    return pd.concat(frames, ignore_index=True)
+
+def score(model, le, data):
+    """Accuracy/precision (percent) on the held-out rows of ``data``."""
+    test = data[data["holdout"]]
+    if test.empty or not set(test[TARGET]) <= set(le.classes_):
+        return {"accuracy": None, "precision": None, "holdout_rows": len(test)}
+    y = le.transform(test[TARGET])
+    y_pred = model.predict(test[FEATURES])
+    return {
+        "accuracy": round(accuracy_score(y, y_pred) * 100, 2),
+        "precision": round(precision_score(y, y_pred, average='macro', zero_division=0) * 100, 2),
+        "holdout_rows": len(test),
+    }
+
+def _fit(train):
+    le = LabelEncoder()
+    y = le.fit_transform(train[TARGET])
+    model = RandomForestClassifier(n_estimators=N_ESTIMATORS, random_state=42)
+    model.fit(train[FEATURES], y)
+    return model, le
+
+def _bundle(model, le, data, fit_seconds, train_rows, data_hash_, parts, mode, updates=0, base_trees=None):
+    return {
+        "version": BUNDLE_VERSION,
+        "sklearn_version": sklearn.__version__,
+        "model": model,
+        "engine": CompiledForest.from_sklearn(model),
+        "encoder": le,
+        "features": FEATURES,
+        "defaults": data[FEATURES].iloc[0].to_dict(),
+        "metrics": {
+            **score(model, le, data),
+            "fit_seconds": round(fit_seconds, 3),
+            "rows": train_rows,
+            "trees": len(model.estimators_),
+            "base_trees": base_trees or len(model.estimators_),
+            "mode": mode,
+            "updates": updates,
+        },
+        "data_hash": data_hash_,
+        "parts": parts,
+        "trained_at": time.time(),
+    }
+
+def train_bundle(path=DATA_PATH, samples_dir=SAMPLES_DIR):
+    """Fit from scratch on the CSV plus all stored samples, minus the holdout."""
+    parts = list_parts(samples_dir)
+    data = load_training_data(path, samples_dir, parts)
+    train = data[~data["holdout"]]
+
+    start = time.time()
+    model, le = _fit(train)
+    fit_seconds = time.time() - start
+
+    csv_hash = data_hash(path) if os.path.exists(path) else None
+    return _bundle(model, le, data, fit_seconds, len(train), csv_hash, parts, "full")
+
+def update_bundle(bundle, path=DATA_PATH, samples_dir=SAMPLES_DIR, mode=RETRAIN_MODE):
+    """Fold sample parts the bundle has not seen yet into a new bundle.
+
+    Returns None when there is nothing new. Warm mode grows the forest by
+    TREES_PER_UPDATE trees fit on the new rows plus a replay sample of the
+    whole history (at least MIN_UPDATE_ROWS rows in all, at most
+    WINDOW_ROWS), and evicts only trees added by earlier updates, never
+    the base forest. Falls back to a windowed refit when the new rows
+    bring a label the encoder does not know, or when the warm-start rows
+    do not cover every known class (each tree must see all classes for
+    the forest's outputs to line up). The metrics carry the current
+    model's accuracy on the same held-out rows as ``previous_accuracy``.
+    """
+    parts = list_parts(samples_dir)
+    seen = set(bundle["parts"])
+    new_parts = [p for p in parts if p not in seen]
+    if not new_parts:
+        return None
+    fresh = read_parts(new_parts, samples_dir)[FEATURES + [TARGET, "holdout"]]
+    try:
+        old = load_training_data(path, samples_dir, [p for p in parts if p in seen])
+    except FileNotFoundError:
+        old = fresh.iloc[:0]
+    data = pd.concat([old, fresh], ignore_index=True)
+    train = data[~data["holdout"]]
+    new = fresh[~fresh["holdout"]]
+    le = bundle["encoder"]
+    updates = bundle["metrics"]["updates"] + 1
+    previous = score(bundle["model"], le, data)["accuracy"]
+
+    if mode == "warm" and not new.empty and set(new[TARGET]) <= set(le.classes_):
+        old = old[~old["holdout"]]
+        n = min(max(int(len(new) * REPLAY_RATIO), MIN_UPDATE_ROWS - len(new)), WINDOW_ROWS - len(new))
+        replay = old.sample(max(0, min(len(old), n)), random_state=len(bundle["parts"]))
+        rows = pd.concat([new, replay], ignore_index=True)
+        if set(rows[TARGET]) == set(le.classes_):
+            model = copy.deepcopy(bundle["model"])
+            base = bundle["metrics"].get("base_trees", N_ESTIMATORS)
+            start = time.time()
+            model.set_params(warm_start=True, n_estimators=len(model.estimators_) + TREES_PER_UPDATE)
+            model.fit(rows[FEATURES], le.transform(rows[TARGET]))
+            # Drop the oldest update trees so the forest tracks recent data
+            # and predict latency stays bounded; the base forest stays.
+            added = model.estimators_[base:]
+            keep = max(MAX_TREES - base, TREES_PER_UPDATE)
+            model.estimators_ = model.estimators_[:base] + added[-keep:]
+            model.set_params(warm_start=False, n_estimators=len(model.estimators_))
+            fit_seconds = time.time() - start
+            out = _bundle(model, le, data, fit_seconds, len(rows), bundle["data_hash"], parts,
+                          "warm", updates, base)
+            out["metrics"]["previous_accuracy"] = previous
+            return out
+
+    window = train.iloc[-WINDOW_ROWS:]
+    start = time.time()
+    model, le = _fit(window)
+    fit_seconds = time.time() - start
+    out = _bundle(model, le, data, fit_seconds, len(window), bundle["data_hash"], parts, "window", updates)
+    out["metrics"]["previous_accuracy"] = previous
+    return out
+
+def regressed(metrics):
+    """True if an update scores worse than the model it would replace."""
+    new, old = metrics.get("accuracy"), metrics.get("previous_accuracy")
+    return new is not None and old is not None and new < old - MAX_REGRESSION
+
+def save_bundle(bundle, path=MODEL_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    joblib.dump(bundle, tmp)
+    os.replace(tmp, path)
+
+def load_bundle(path=MODEL_PATH):
+    try:
+        bundle = joblib.load(path)
+    except FileNotFoundError:
+        return None
+    except Exception:
+        # Written by another sklearn/numpy version: its classes no longer
+        # unpickle (AttributeError, ModuleNotFoundError, ...). Retrain.
+        log.warning("ignoring unreadable model bundle %s", path, exc_info=True)
+        return None
+    if not isinstance(bundle, dict) or bundle.get("version") != BUNDLE_VERSION or bundle.get("sklearn_version") != sklearn.__version__:
+        return None
+    return bundle
+
+def predict_proba(bundle, X):
+    """Class probabilities for the rows of ``X``, columns in the order of
+    ``bundle["engine"].classes_`` (the encoded labels)."""
+    if len(X) <= ENGINE_MAX_ROWS:
+        return bundle["engine"].predict_proba(X)
+    return bundle["model"].predict_proba(pd.DataFrame(X, columns=bundle["features"]))
+
+# ---------------- SHARED CACHE ----------------
+
+def _stat(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+def _stat_or_none(path):
+    try:
+        return _stat(path)
+    except FileNotFoundError:
+        return None
+
+def get_model_bundle(data_path=DATA_PATH, model_path=MODEL_PATH):
+    """Return the process-wide model bundle, retraining only if the CSV changed.
+
+    A cheap stat() check of the CSV and the bundle file runs on every call.
+    A bundle file replaced by another process (the retrain worker) is loaded
+    in its place; the CSV is hashed only when its mtime or size moved, and
+    the forest is refit only when that hash differs from the bundle's.
+    """
+    with _lock:
+        stat = _stat_or_none(data_path)
+        model_stat = _stat_or_none(model_path)
+        if _cache["bundle"] is not None and (_cache["stat"], _cache["model_stat"]) == (stat, model_stat):
+            return _cache["bundle"]
+
+        start = time.perf_counter()
+        source = None
+        bundle = _cache["bundle"]
+        if bundle is None or model_stat != _cache["model_stat"]:
+            loaded = load_bundle(model_path)
+            if loaded is not None:
+                bundle, source = loaded, "disk"
+        if stat is not None:
+            if stat != _cache["stat"]:
+                _cache["hash"] = data_hash(data_path)
+            if bundle is None or bundle["data_hash"] != _cache["hash"]:
+                with timer("model_train"):
+                    bundle = train_bundle(data_path)
+                save_bundle(bundle, model_path)
+                model_stat, source = _stat_or_none(model_path), "train"
+        elif bundle is None:
+            raise FileNotFoundError(data_path)
+        if source:
+            MODEL_LOAD_SECONDS.labels(source).set(time.perf_counter() - start)
+
+        _cache.update(bundle=bundle, stat=stat, model_stat=model_stat)
+        return bundle
+
+# ---------------- BACKGROUND RETRAIN ----------------
+
+@contextmanager
+def _file_lock(path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def retrain(data_path=DATA_PATH, model_path=MODEL_PATH, samples_dir=SAMPLES_DIR, mode=RETRAIN_MODE):
+    """Bring the saved bundle up to date with the sample store.
+
+    Serialized across processes with a lock file; returns the new metrics,
+    or None if the bundle already covered every part. An update that
+    scores worse on the held-out rows than the saved bundle is not saved;
+    its metrics come back with ``rejected`` set and the parts are tried
+    again, with whatever has arrived since, on the next run.
+    """
+    with _file_lock(model_path + ".lock"):
+        bundle = load_bundle(model_path)
+        csv_hash = data_hash(data_path) if os.path.exists(data_path) else None
+        if bundle is None or (csv_hash and bundle["data_hash"] != csv_hash):
+            bundle = train_bundle(data_path, samples_dir)
+        else:
+            bundle = update_bundle(bundle, data_path, samples_dir, mode)
+            if bundle is None:
+                return None
+            if regressed(bundle["metrics"]):
+                log.warning("retrain rejected: held-out accuracy %s < %s",
+                            bundle["metrics"]["accuracy"], bundle["metrics"]["previous_accuracy"])
+                return {**bundle["metrics"], "rejected": True}
+        save_bundle(bundle, model_path)
+        return bundle["metrics"]
+
+
+class RetrainWorker:
+    """Runs ``retrain`` in a child process, one run at a time.
+
+    A request that arrives while a run is in flight is folded into one
+    follow-up run. The running app picks the new bundle up through
+    get_model_bundle's stat check, so nothing has to restart. The pool is
+    created lazily (and per pid) with the spawn start method, so it is
+    safe to use from threaded and forked gunicorn workers, and replaced
+    when its child dies.
+    """
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.last = None
+        self._future = None
+        self._pending = False
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _executor(self, broken=False):
+        if self._pid != os.getpid() or broken:
+            if self._pid == os.getpid():
+                self._pool.shutdown(wait=False)
+            self._pid = os.getpid()
+            self._pool = ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def _submit(self):
+        try:
+            return self._executor().submit(retrain, **self.kwargs)
+        except BrokenProcessPool:
+            return self._executor(broken=True).submit(retrain, **self.kwargs)
+
+    def submit(self):
+        """Start a retrain; returns "started", "queued" if one is running,
+        or "failed" if it could not be started."""
+        with self._lock:
+            if self._future is not None and not self._future.done():
+                self._pending = True
+                return "queued"
+            try:
+                future = self._future = self._submit()
+            except Exception as e:  # e.g. pool shut down at interpreter exit
+                log.exception("soil model retrain could not be started")
+                self.last = {"error": str(e)}
+                return "failed"
+        # Outside the lock: a future that is already done runs _done here,
+        # and _done takes the lock.
+        future.add_done_callback(self._done)
+        return "started"
+
+    def _done(self, future):
+        try:
+            self.last = future.result() or self.last
+        except Exception as e:
+            log.exception("soil model retrain failed")
+            self.last = {"error": str(e)}
+        with self._lock:
+            pending, self._pending = self._pending, False
+        if pending:
+            self.submit()
@@ -0,0 +1,181 @@
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+SINK_TTL = float(os.environ.get("SESSION_TTL", 300))
+
+log = logging.getLogger(__name__)
+
+
+class Stage:
+    """One pipeline step: a latest-frame slot per session, drained by the
+    stage's own worker threads.
+
+    ``put`` never blocks. A new frame replaces the one its session already
+    has waiting (counted as dropped), so a slow stage sheds stale frames
+    instead of building latency, and a fast camera can only ever occupy
+    its own slot. Sessions are served in the order their slot was filled,
+    and only one frame per session is in flight at a time: its next
+    frame waits in the slot until the current one has been handed on, so
+    frames leave every stage in the order they arrived. Threads start on
+    first use so they exist in each forked worker.
+    """
+
+    def __init__(self, name, fn, workers=1):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.emit = None
+        self.dropped = 0
+        self.processed = 0
+        self._slots = OrderedDict()
+        self._busy = set()
+        self._cond = threading.Condition()
+        self._pid = None
+
+    def _ensure_workers(self):
+        with self._cond:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                for i in range(self.workers):
+                    threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True).start()
+
+    def put(self, item):
+        self._ensure_workers()
+        sid, seq, payload = item
+        with self._cond:
+            if sid in self._slots:
+                self.dropped += 1
+            # Replacing keeps the slot's place in line.
+            self._slots[sid] = (seq, payload)
+            self._cond.notify()
+
+    def queued(self):
+        with self._cond:
+            return len(self._slots)
+
+    def _next_sid(self):
+        return next((sid for sid in self._slots if sid not in self._busy), None)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._next_sid() is not None)
+                sid = self._next_sid()
+                seq, payload = self._slots.pop(sid)
+                self._busy.add(sid)
+            try:
+                out = self.fn(sid, payload)
+                self.processed += 1
+                if out is not None and self.emit:
+                    self.emit((sid, seq, out))
+            except Exception:
+                log.exception("stream stage %s failed", self.name)
+            finally:
+                with self._cond:
+                    self._busy.discard(sid)
+                    self._cond.notify_all()
+
+
+class FrameSink:
+    """Latest output frame of one session; readers wait for a newer one."""
+
+    def __init__(self):
+        self.seq = -1
+        self.frame = None
+        self.updated = time.time()
+        self.viewers = 0
+        self._cond = threading.Condition()
+
+    def publish(self, seq, frame):
+        with self._cond:
+            # Parallel workers can finish out of order; never go backwards.
+            if seq <= self.seq:
+                return False
+            self.seq, self.frame, self.updated = seq, frame, time.time()
+            self._cond.notify_all()
+            return True
+
+    def wait(self, after_seq, timeout):
+        with self._cond:
+            self._cond.wait_for(lambda: self.seq > after_seq, timeout)
+            return self.seq, self.frame
+
+
+class StreamPipeline:
+    """decode -> classify -> encode, each stage with its own slots and threads.
+
+    ``stages`` is a list of (name, fn, workers); every fn takes
+    ``(session_id, payload)`` and returns the next payload, or None to drop
+    the frame. The last stage's output lands in the session's FrameSink.
+    ``placeholder`` (JPEG bytes) is sent while a viewer waits for a
+    session's first frame.
+    """
+
+    def __init__(self, stages, placeholder=None):
+        self.stages = [Stage(name, fn, workers) for name, fn, workers in stages]
+        self.placeholder = placeholder
+        for stage, nxt in zip(self.stages, self.stages[1:]):
+            stage.emit = nxt.put
+        self.stages[-1].emit = self._publish
+        self.stale = 0
+        self._seq = itertools.count()
+        self._sinks = {}
+        self._lock = threading.RLock()
+
+    def sink(self, sid):
+        with self._lock:
+            sink = self._sinks.get(sid)
+            if sink is None:
+                now = time.time()
+                # A sink with an open viewer stays even if its camera paused.
+                for old in [s for s, k in self._sinks.items() if now - k.updated > SINK_TTL and not k.viewers]:
+                    del self._sinks[old]
+                sink = self._sinks[sid] = FrameSink()
+            return sink
+
+    def push(self, sid, data):
+        seq = next(self._seq)
+        self.stages[0].put((sid, seq, data))
+        return seq
+
+    def _publish(self, item):
+        sid, seq, frame = item
+        if not self.sink(sid).publish(seq, frame):
+            self.stale += 1
+
+    def frames(self, sid, timeout=10):
+        """Yield each new output frame of ``sid`` as it is published.
+
+        Every ``timeout`` seconds without a new frame the last one (or the
+        placeholder, before the first) is sent again. That keeps the
+        connection open while the camera is still starting and lets the
+        server notice a viewer that went away. Without a placeholder it
+        ends if nothing at all has been published within ``timeout``.
+        """
+        with self._lock:
+            sink = self.sink(sid)
+            sink.viewers += 1
+        try:
+            seq = -1
+            if self.placeholder is not None:
+                yield self.placeholder
+            while True:
+                seq_now, frame = sink.wait(seq, timeout)
+                if frame is None:
+                    if self.placeholder is None:
+                        return
+                    frame = self.placeholder
+                seq = seq_now
+                yield frame
+        finally:
+            with self._lock:
+                sink.viewers -= 1
+
+    def stats(self):
+        stages = {s.name: {"processed": s.processed, "dropped": s.dropped, "queued": s.queued()}
+                  for s in self.stages}
+        return {"stages": stages, "stale": self.stale, "sessions": len(self._sinks)}
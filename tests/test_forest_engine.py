@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from benchmarks.bench_forest import random_rows
+from benchmarks.synthetic import synthetic_bundle
+from soil_model import ENGINE_MAX_ROWS, predict_proba
+
+pytestmark = pytest.mark.filterwarnings("ignore:X does not have valid feature names")
+
+
+@pytest.fixture(scope="module")
+def bundle():
+    return synthetic_bundle(2000)
+
+def test_compiled_forest_matches_sklearn(bundle):
+    X = random_rows(5000)
+    expected = bundle["model"].predict_proba(X.astype(np.float32))
+    np.testing.assert_allclose(bundle["engine"].predict_proba(X), expected, rtol=0, atol=1e-9)
+
+def test_single_row_matches_batch(bundle):
+    X = random_rows(50, seed=1)
+    engine = bundle["engine"]
+    batch = engine.predict_proba(X)
+    for i in range(len(X)):
+        np.testing.assert_array_equal(engine.predict_proba(X[i:i + 1])[0], batch[i])
+    np.testing.assert_array_equal(engine.predict(X), engine.classes_[batch.argmax(axis=1)])
+
+def test_predict_proba_same_on_both_paths(bundle):
+    X = random_rows(ENGINE_MAX_ROWS + 1, seed=2)
+    small = np.vstack([predict_proba(bundle, X[:ENGINE_MAX_ROWS]), predict_proba(bundle, X[ENGINE_MAX_ROWS:])])
+    np.testing.assert_allclose(predict_proba(bundle, X), small, rtol=0, atol=1e-9)
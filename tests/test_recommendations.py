@@ -0,0 +1,53 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from recommendations import MESSAGES, format_recommendations, recommend_fertilizer, recommendation_bits
+
+
+# The per-row if-chains the rule table replaced, kept verbatim as the reference.
+def legacy_recommend_fertilizer(pH, N, P, K, OM, SM, PMR, PHI, language="English"):
+    recs = []
+    if language == "English":
+        if pH < 5.5: recs.append("🧪 Add lime to reduce acidity.")
+        elif pH > 7.5: recs.append("🧪 Add sulfur or compost to lower alkalinity.")
+        if N < 1.5: recs.append("🌬️ Use urea or ammonium sulfate.")
+        if P < 1.0: recs.append("🔥 Apply single super phosphate.")
+        if K < 1.5: recs.append("🪨 Use muriate of potash or composted banana peels.")
+        if OM < 3.0: recs.append("🌿 Add organic manure or vermicompost.")
+        if SM < 40: recs.append("💧 Improve irrigation or add mulch.")
+        if PMR < 75: recs.append("⚔️ Use neem-based biopesticides.")
+        if PHI < 80: recs.append("🌟 Apply balanced NPK and monitor stress.")
+    else:  # Tamil
+        if pH < 5.5: recs.append("🧪 அமிலத்தன்மையை குறைக்க சுண்ணாம்பு சேர்க்கவும்.")
+        elif pH > 7.5: recs.append("🧪 காரத்தன்மையை குறைக்க சல்பர் அல்லது கம்போஸ்ட் சேர்க்கவும்.")
+        if N < 1.5: recs.append("🌬️ யூரியா அல்லது அமோனியம் சல்பேட் பயன்படுத்தவும்.")
+        if P < 1.0: recs.append("🔥 சிங்கிள் சூப்பர் பாஸ்பேட் பயன்படுத்தவும்.")
+        if K < 1.5: recs.append("🪨 முரியேட் ஆஃப் பொட்டாஷ் அல்லது வாழைப்பழ தோல் கம்போஸ்ட் பயன்படுத்தவும்.")
+        if OM < 3.0: recs.append("🌿 இயற்கை உரம் அல்லது வெர்மி கம்போஸ்ட் சேர்க்கவும்.")
+        if SM < 40: recs.append("💧 நீர்ப்பாசனத்தை மேம்படுத்தவும் அல்லது மல்ச் பயன்படுத்தவும்.")
+        if PMR < 75: recs.append("⚔️ வேப்பை அடிப்படையிலான உயிர் பூச்சிக்கொல்லிகளை பயன்படுத்தவும்.")
+        if PHI < 80: recs.append("🌟 சமநிலை NPK உரம் பயன்படுத்தி செடி அழுத்தத்தை கண்காணிக்கவும்.")
+    return recs
+
+def around(*thresholds):
+    """Each threshold and the nearest floats either side of it."""
+    return sorted(v for t in thresholds for v in (np.nextafter(t, -np.inf), t, np.nextafter(t, np.inf)))
+
+# In FEATURES order: pH, N, P, K, OM, SM, PMR, PHI.
+BOUNDARIES = [around(5.5, 7.5), around(1.5), around(1.0), around(1.5),
+              around(3.0), around(40), around(75), around(80)]
+ROWS = list(itertools.product(*BOUNDARIES))
+
+
+@pytest.mark.parametrize("language", list(MESSAGES))
+def test_single_row_matches_legacy(language):
+    for row in ROWS:
+        assert recommend_fertilizer(*row, language=language) == legacy_recommend_fertilizer(*row, language=language), row
+
+@pytest.mark.parametrize("language", list(MESSAGES))
+def test_batch_matches_legacy(language):
+    rendered = format_recommendations(recommendation_bits(np.array(ROWS)), language, sep="\n")
+    for row, text in zip(ROWS, rendered):
+        assert text == "\n".join(legacy_recommend_fertilizer(*row, language=language)), row
@@ -0,0 +1,143 @@
+import hmac
+import os
+
+import numpy as np
+import pandas as pd
+from flask import Blueprint, Flask, jsonify, request
+
+from recommendations import MESSAGES, decode_bits, localize, recommendation_bits
+from metrics import init_flask, timer
+from sample_store import append_samples
+from soil_model import FEATURES, TARGET, RetrainWorker, get_model_bundle, predict_proba
+
+toxicity_api = Blueprint("toxicity_api", __name__)
+
+MAX_BATCH = 10_000
+# POST /samples writes training data, so it is off unless a token is set;
+# callers send it as "Authorization: Bearer <token>".
+SAMPLES_TOKEN = os.environ.get("SAMPLES_TOKEN", "")
+
+retrainer = RetrainWorker()
+
+
+def _parse_readings(payload):
+    single = isinstance(payload, dict) and "readings" not in payload
+    readings = [payload] if single else payload.get("readings") if isinstance(payload, dict) else payload
+    if not isinstance(readings, list) or not readings:
+        raise ValueError("expected a reading object, a list of readings, or {\"readings\": [...]}")
+    if len(readings) > MAX_BATCH:
+        raise ValueError(f"at most {MAX_BATCH} readings per request")
+
+    rows = []
+    for r in readings:
+        if isinstance(r, dict):
+            missing = [f for f in FEATURES if f not in r]
+            if missing:
+                raise ValueError(f"missing fields: {', '.join(missing)}")
+            rows.append([r[f] for f in FEATURES])
+        elif isinstance(r, list) and len(r) == len(FEATURES):
+            rows.append(r)
+        else:
+            raise ValueError(f"each reading needs the fields {', '.join(FEATURES)}")
+    # Only real JSON numbers: np.array would turn null/"nan" into NaN and
+    # true into 1.0, and the forest would still return a confident label.
+    if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for row in rows for v in row):
+        raise ValueError("readings must be numeric")
+    X = np.array(rows, dtype=float)
+    if not np.isfinite(X).all():
+        raise ValueError("readings must be numeric")
+    return X, single
+
+def _authorized(header):
+    scheme, _, token = (header or "").partition(" ")
+    return bool(SAMPLES_TOKEN) and scheme.lower() == "bearer" and hmac.compare_digest(token.encode(), SAMPLES_TOKEN.encode())
+
+def _parse_samples(payload):
+    samples = payload.get("samples") if isinstance(payload, dict) else payload
+    if not isinstance(samples, list) or not all(isinstance(r, dict) for r in samples):
+        raise ValueError("expected {\"samples\": [...]} or a list of sample objects")
+    labels = [r.get(TARGET) for r in samples]
+    if not all(isinstance(label, str) and label for label in labels):
+        raise ValueError(f"every sample needs a {TARGET} label")
+    # A typo ("toxic") would otherwise become a new class at the next retrain.
+    try:
+        known = set(get_model_bundle()["encoder"].classes_)
+    except FileNotFoundError:
+        known = None
+    unknown = sorted(set(labels) - known) if known else []
+    if unknown:
+        raise ValueError(f"unknown {TARGET} labels: {', '.join(unknown)}; expected one of {', '.join(sorted(known))}")
+    # Features must be finite JSON numbers, same as /predict.
+    X, _ = _parse_readings(samples)
+    df = pd.DataFrame(X, columns=FEATURES)
+    df[TARGET] = labels
+    return df
+
+# ---------------- ROUTES ----------------
+
+@toxicity_api.route('/predict', methods=['POST'])
+def predict():
+    language = request.args.get("language")
+    if language and language not in MESSAGES:
+        return jsonify({"error": f"unsupported language: {language}"}), 400
+    try:
+        X, single = _parse_readings(request.get_json(force=True, silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        bundle = get_model_bundle()
+    except FileNotFoundError:
+        return jsonify({"error": "model not available"}), 503
+
+    with timer("predict"):
+        proba = predict_proba(bundle, X)
+    best = proba.argmax(axis=1)
+    labels = bundle["encoder"].inverse_transform(bundle["engine"].classes_[best])
+    bits = recommendation_bits(X)
+
+    results = []
+    for label, p, b in zip(labels, proba[np.arange(len(best)), best], bits):
+        codes = decode_bits(b)
+        result = {"label": str(label), "probability": round(float(p), 4), "recommendations": codes}
+        if language:
+            result["advice"] = localize(codes, language)
+        results.append(result)
+
+    return jsonify(results[0] if single else {"predictions": results})
+
+# Labelled lab results: stored as a new sample part, then folded into the
+# model by a background retrain (?retrain=0 to only store). Needs the
+# SAMPLES_TOKEN bearer token; without one configured the route is off.
+@toxicity_api.route('/samples', methods=['POST'])
+def add_samples():
+    if not SAMPLES_TOKEN:
+        return jsonify({"error": "sample ingestion is disabled (set SAMPLES_TOKEN)"}), 403
+    if not _authorized(request.headers.get("Authorization")):
+        return jsonify({"error": "invalid or missing token"}), 401
+    try:
+        df = _parse_samples(request.get_json(force=True, silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    part = append_samples(df)
+    result = {"stored": len(df), "part": part}
+    if request.args.get("retrain", "1") not in ("", "0", "false"):
+        result["retrain"] = retrainer.submit()
+    return jsonify(result), 202
+
+@toxicity_api.route('/model_info')
+def model_info():
+    try:
+        bundle = get_model_bundle()
+    except FileNotFoundError:
+        return jsonify({"error": "model not available"}), 503
+    return jsonify({"features": bundle["features"], "data_hash": bundle["data_hash"],
+                    "trained_at": bundle["trained_at"], "parts": len(bundle["parts"]),
+                    **bundle["metrics"], "last_retrain": retrainer.last})
+
+
+if __name__ == "__main__":
+    app = Flask(__name__)
+    app.register_blueprint(toxicity_api)
+    init_flask(app)
+    port = int(os.environ.get("PORT", 8001))
+    app.run(host="0.0.0.0", port=port, threaded=True)
@@ -0,0 +1,37 @@
+import argparse
+import json
+
+import pandas as pd
+
+from sample_store import SAMPLES_DIR, append_samples
+from soil_model import DATA_PATH, FEATURES, MODEL_PATH, RETRAIN_MODE, TARGET, retrain, save_bundle, train_bundle
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the soil toxicity model and write a versioned bundle.")
+    parser.add_argument("--data", default=DATA_PATH, help="training CSV (default: %(default)s)")
+    parser.add_argument("--out", default=MODEL_PATH, help="bundle path (default: %(default)s)")
+    parser.add_argument("--samples", default=SAMPLES_DIR, help="labelled sample store (default: %(default)s)")
+    parser.add_argument("--ingest", metavar="FILE", help="append labelled samples (CSV/Parquet) before training")
+    parser.add_argument("--update", action="store_true",
+                        help="update the existing bundle with new samples instead of a full refit")
+    parser.add_argument("--mode", choices=["warm", "window"], default=RETRAIN_MODE,
+                        help="how --update folds in new samples (default: %(default)s)")
+    args = parser.parse_args()
+
+    if args.ingest:
+        read = pd.read_parquet if args.ingest.endswith((".parquet", ".pq")) else pd.read_csv
+        append_samples(read(args.ingest)[FEATURES + [TARGET]], args.samples)
+
+    if args.update:
+        metrics = retrain(args.data, args.out, args.samples, args.mode)
+        print(json.dumps({"bundle": args.out, **(metrics or {"status": "up to date"})}, indent=2))
+        return
+
+    bundle = train_bundle(args.data, args.samples)
+    save_bundle(bundle, args.out)
+    print(json.dumps({"bundle": args.out, "data_hash": bundle["data_hash"], **bundle["metrics"]}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
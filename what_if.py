@@ -0,0 +1,86 @@
+"""What-if response surfaces for the Streamlit pages.
+
+The surface over two features depends only on the model and the other six
+values, so it is memoized on exactly that (the model by its bundle's
+``trained_at``): dragging either grid feature's slider is a cache hit, and
+only moving one of the fixed values costs a prediction (one batch of
+GRID_STEPS**2 rows). The cache lives here rather than in app.py because
+Streamlit re-executes app.py on every rerun but keeps imported modules.
+"""
+import functools
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from soil_model import FEATURE_RANGES, FEATURES
+
+GRID_STEPS = 40
+SURFACE_CACHE_SIZE = int(os.environ.get("SURFACE_CACHE_SIZE", 256))
+
+
+def grid_axis(feature, steps=GRID_STEPS):
+    lo, hi = FEATURE_RANGES[feature]
+    return np.linspace(lo, hi, steps)
+
+class _Model:
+    """Cache key for a bundle's model: equal and hashed by ``trained_at``,
+    so the key stays cheap to hash whatever the forest's size."""
+
+    def __init__(self, bundle):
+        self.trained_at = bundle["trained_at"]
+        self.model = bundle["model"]
+
+    def __eq__(self, other):
+        return self.trained_at == other.trained_at
+
+    def __hash__(self):
+        return hash(self.trained_at)
+
+_swap_lock = threading.Lock()
+_trained_at = None
+
+def _check_swap(bundle):
+    # Keys hold the model, so drop every entry once a newer bundle shows up
+    # rather than keep up to SURFACE_CACHE_SIZE old forests alive. A
+    # request still holding an older bundle does not clear the new entries.
+    global _trained_at
+    with _swap_lock:
+        if _trained_at is None or bundle["trained_at"] > _trained_at:
+            if _trained_at is not None:
+                _surface.cache_clear()
+            _trained_at = bundle["trained_at"]
+
+@functools.lru_cache(maxsize=SURFACE_CACHE_SIZE)
+def _surface(key, class_index, x_feature, y_feature, base, steps):
+    model = key.model
+    xs, ys = grid_axis(x_feature, steps), grid_axis(y_feature, steps)
+    gx, gy = np.meshgrid(xs, ys)
+    X = np.tile(np.array(base, dtype=np.float32), (gx.size, 1))
+    X[:, FEATURES.index(x_feature)] = gx.ravel()
+    X[:, FEATURES.index(y_feature)] = gy.ravel()
+    # Batches go through sklearn, which is faster than the compiled
+    # engine at this size (the engine wins on single rows).
+    z = 1 - model.predict_proba(pd.DataFrame(X, columns=FEATURES))[:, class_index].reshape(gy.shape)
+    for a in (xs, ys, z):
+        a.setflags(write=False)
+    return xs, ys, z
+
+def response_surface(bundle, x_feature, y_feature, values, steps=GRID_STEPS):
+    """1 - P("Safe") over a grid of two features, the rest held at ``values``.
+
+    That is the toxicity risk whatever the non-safe classes are called, the
+    same reading show_prediction_block uses. Returns ``(xs, ys, z)`` with
+    ``z[i, j]`` the value at ``(xs[j], ys[i])``, the layout go.Heatmap
+    expects. The arrays are shared with the cache and read-only.
+    """
+    grid = {FEATURES.index(x_feature), FEATURES.index(y_feature)}
+    base = tuple(0.0 if k in grid else round(float(v), 4) for k, v in enumerate(values))
+    _check_swap(bundle)
+    model = bundle["model"]
+    class_index = int(np.flatnonzero(model.classes_ == bundle["encoder"].transform(["Safe"])[0])[0])
+    return _surface(_Model(bundle), class_index, x_feature, y_feature, base, steps)
+
+def cache_info():
+    return _surface.cache_info()